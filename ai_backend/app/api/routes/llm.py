@@ -1,4 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
 
 from ...schemas.llm import GenerateRequest, GenerateResponse
 from ...services.llm_service import generate_text_response_full, generate_text_response_patch
@@ -6,9 +9,35 @@ from ...services.llm_service import generate_text_response_full, generate_text_r
 
 router = APIRouter(tags=["llm"], prefix="/llm")
 
+# The body is parsed by hand below, so describe it to OpenAPI explicitly
+_GENERATE_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": GenerateRequest.model_json_schema()}},
+    }
+}
 
-@router.post("/generate", response_model=GenerateResponse)
-async def generate_endpoint(payload: GenerateRequest) -> GenerateResponse:
+
+async def _parse_generate_request(request: Request) -> GenerateRequest:
+    # Validate straight from the body bytes: pydantic's JSON parser builds the model in one
+    # pass instead of json.loads into a dict first (patch/code bodies can be large)
+    try:
+        return GenerateRequest.model_validate_json(await request.body())
+    except ValidationError as exc:
+        # Same 422 shape FastAPI produces for a declared body parameter
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in exc.errors(include_url=False)]
+        ) from exc
+
+
+@router.post(
+    "/generate",
+    response_model=GenerateResponse,
+    response_class=ORJSONResponse,
+    openapi_extra=_GENERATE_REQUEST_BODY,
+)
+async def generate_endpoint(request: Request) -> GenerateResponse:
+    payload = await _parse_generate_request(request)
     try:
         mode = (payload.mode or ("patch" if payload.patch else "full")).lower()
         if mode == "full":
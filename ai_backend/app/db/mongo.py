@@ -4,14 +4,25 @@ from functools import lru_cache
 from motor.motor_asyncio import AsyncIOMotorClient
 
 
+# Shared pool/timeout settings for every Motor client in this service.
+# zstd needs the zstandard package; zlib is the stdlib fallback when it is missing.
+MOTOR_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "10")),
+    "serverSelectionTimeoutMS": 2000,
+    "connectTimeoutMS": 2000,
+    "socketTimeoutMS": 10000,
+    "compressors": "zstd,zlib",
+    "retryWrites": True,
+}
+
+
 @lru_cache()
 def get_client() -> AsyncIOMotorClient:
     url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-    return AsyncIOMotorClient(url)
+    return AsyncIOMotorClient(url, **MOTOR_CLIENT_OPTIONS)
 
 
 def get_db():
     client = get_client()
     return client[os.getenv("MONGO_DB", "hack_ai")]
-
-
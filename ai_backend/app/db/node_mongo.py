@@ -1,13 +1,23 @@
 import os
+import time
 from functools import lru_cache
+from typing import Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from .mongo import MOTOR_CLIENT_OPTIONS
+
+
+_SESSION_COLL: Optional[str] = None
+_SESSION_COLL_CHECKED_AT = 0.0
+# How long a "sessionmodels" fallback is trusted before checking for "sessions" again
+_SESSION_COLL_RECHECK_S = 30.0
+
 
 @lru_cache()
 def get_node_client() -> AsyncIOMotorClient:
     url = os.getenv("NODE_MONGO_URL", os.getenv("MONGO_URI", "mongodb://localhost:27017"))
-    return AsyncIOMotorClient(url)
+    return AsyncIOMotorClient(url, **MOTOR_CLIENT_OPTIONS)
 
 
 def get_node_db():
@@ -15,11 +25,29 @@ def get_node_db():
     return client[os.getenv("NODE_MONGO_DB", "hack")]
 
 
+async def _resolve_session_coll(db) -> str:
+    """Pick the Node backend's session collection name.
+
+    "sessions" is kept for the life of the process. It may not exist yet at
+    startup, so a "sessionmodels" fallback is re-checked every
+    _SESSION_COLL_RECHECK_S seconds; lookups in between use it as is.
+    """
+    global _SESSION_COLL, _SESSION_COLL_CHECKED_AT
+    if _SESSION_COLL == "sessions":
+        return _SESSION_COLL
+    now = time.monotonic()
+    if _SESSION_COLL is not None and now - _SESSION_COLL_CHECKED_AT < _SESSION_COLL_RECHECK_S:
+        return _SESSION_COLL
+    # Claimed before the await, so concurrent lookups keep the current answer meanwhile
+    _SESSION_COLL_CHECKED_AT = now
+    names = await db.list_collection_names()
+    _SESSION_COLL = "sessions" if "sessions" in names else "sessionmodels"
+    return _SESSION_COLL
+
+
 async def find_session_by_id(session_id: str):
     db = get_node_db()
     # Session collection name in Node backend
-    coll = db["sessions" if "sessions" in await db.list_collection_names() else "sessionmodels"]
+    coll = db[await _resolve_session_coll(db)]
     doc = await coll.find_one({"sessionId": session_id})
     return doc
-
-
@@ -1,11 +1,86 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from .api.routes.llm import router as llm_router
-from .utils.llm_logger import _get_log_path
+from .db.mongo import get_client
+from .db.node_mongo import get_node_client
+from .repositories.snapshots import ensure_snapshot_indexes
+from .services.llm_service import _safe_get_dmp, start_snapshot_writer, stop_snapshot_writer
+from .utils.llm_logger import _get_log_path, start_log_writer, stop_log_writer
+
+
+async def _size_default_executor() -> None:
+    """Raise the loop's default thread pool (patching, file logs, SDK executor fallbacks).
+
+    The stdlib default is min(32, cpu + 4) threads. LangChain runs ainvoke in
+    this executor when a provider has no native async path, so the pool still
+    bounds concurrent LLM calls. Keep LLM_THREADS in line with the provider's
+    rate limits; more threads only queue upstream.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=int(os.getenv("LLM_THREADS", "128"))))
+
+
+async def _clear_llm_responses_log() -> None:
+    """Truncate the temporary LLM responses log on each service (re)start."""
+    try:
+        log_path = await asyncio.to_thread(_get_log_path)
+        # Create/truncate the file
+        await asyncio.to_thread(log_path.write_text, "", encoding="utf-8")
+    except Exception:
+        # Best-effort cleanup; avoid failing app startup
+        pass
+
+
+async def _warm_mongo_pools() -> None:
+    """Open the Motor pools before the first request instead of on it."""
+    # Mongo may be unreachable at boot; failures are ignored and connections are retried lazily
+    await asyncio.gather(
+        get_client().admin.command("ping"),
+        get_node_client().admin.command("ping"),
+        return_exceptions=True,
+    )
+
+
+async def _ensure_indexes() -> None:
+    """Make sure per-session snapshot lookups are served by an index."""
+    try:
+        await ensure_snapshot_indexes()
+    except Exception:
+        # Mongo may be unreachable at boot; queries still work without the index
+        pass
 
 
-app = FastAPI(title="AI Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _size_default_executor()
+    await _clear_llm_responses_log()
+    start_log_writer()
+    start_snapshot_writer()
+    # Build the shared diff_match_patch instance so the first patch doesn't pay for it
+    _safe_get_dmp()
+    await _warm_mongo_pools()
+    await _ensure_indexes()
+    try:
+        yield
+    finally:
+        await stop_snapshot_writer()
+        await stop_log_writer()
+        # Drop the cached clients too, so a restarted lifespan (tests, reload) opens fresh ones
+        get_client().close()
+        get_client.cache_clear()
+        get_node_client().close()
+        get_node_client.cache_clear()
+
+
+app = FastAPI(title="AI Backend", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS for local frontend dev; adjust as needed for production
 app.add_middleware(
@@ -20,26 +95,29 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress larger bodies (LLM responses); small JSON skips the compression cost
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 app.include_router(llm_router, prefix="/api")
 
 
-@app.on_event("startup")
-async def _clear_llm_responses_log() -> None:
-    """Truncate the temporary LLM responses log on each service (re)start."""
-    try:
-        log_path = _get_log_path()
-        # Create/truncate the file
-        log_path.write_text("", encoding="utf-8")
-    except Exception:
-        # Best-effort cleanup; avoid failing app startup
-        pass
-
-
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("ai_backend.app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # reload is dev-only (AI_BACKEND_RELOAD=1) and cannot be combined with multiple workers.
+    # One worker unless WEB_CONCURRENCY is set: the log/snapshot writers are per-process
+    # and every worker would truncate the shared log file at startup.
+    # uvloop/httptools ship with uvicorn[standard].
+    reload = os.getenv("AI_BACKEND_RELOAD") == "1"
+    uvicorn.run(
+        "ai_backend.app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        reload=reload,
+        workers=None if reload else int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
 
 
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from ..db.mongo import get_db
 
@@ -13,19 +13,38 @@ async def insert_snapshot(document: Dict[str, Any]) -> str:
     return str(result.inserted_id)
 
 
-async def get_last_snapshot_by_session(session_id: str) -> Optional[Dict[str, Any]]:
+async def insert_snapshots(documents: list[Dict[str, Any]]) -> list[str]:
+    """Insert a batch of snapshots in one round-trip; one bad document doesn't block the rest."""
     db = get_db()
     coll = db["snapshots"]
-    doc = await coll.find_one({"session_id": session_id}, sort=[("created_at", -1)])
+    now = datetime.utcnow()
+    docs = [dict(document) for document in documents]
+    for doc in docs:
+        doc.setdefault("created_at", now)
+    result = await coll.insert_many(docs, ordered=False)
+    return [str(_id) for _id in result.inserted_ids]
+
+
+async def ensure_snapshot_indexes() -> None:
+    """Create the (session_id, created_at desc) index used by per-session lookups."""
+    db = get_db()
+    coll = db["snapshots"]
+    await coll.create_index([("session_id", 1), ("created_at", -1)])
+
+
+async def get_last_snapshot_by_session(session_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    db = get_db()
+    coll = db["snapshots"]
+    doc = await coll.find_one({"session_id": session_id}, projection, sort=[("created_at", -1)])
     return doc
 
 
-async def get_snapshots_by_session(session_id: str, limit: int = 500) -> list[Dict[str, Any]]:
+async def get_snapshots_by_session(session_id: str, limit: int = 500, projection: Optional[Dict[str, Any]] = None) -> list[Dict[str, Any]]:
     """Fetch snapshots for a session in chronological order (oldest to newest)."""
     db = get_db()
     coll = db["snapshots"]
-    cursor = coll.find({"session_id": session_id}).sort("created_at", 1).limit(limit)
-    return [doc async for doc in cursor]
+    cursor = coll.find({"session_id": session_id}, projection).sort("created_at", 1).limit(limit)
+    return await cursor.to_list(length=limit)
 
 
 async def count_snapshots_by_session(session_id: str) -> int:
@@ -34,3 +53,19 @@ async def count_snapshots_by_session(session_id: str) -> int:
     return await coll.count_documents({"session_id": session_id})
 
 
+async def get_snapshot_stats_by_session(session_id: str, projection: Optional[Dict[str, Any]] = None) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """Return (snapshot count, latest snapshot) for a session in one round-trip."""
+    db = get_db()
+    coll = db["snapshots"]
+    last_stages: list[Dict[str, Any]] = [{"$sort": {"created_at": -1}}, {"$limit": 1}]
+    if projection:
+        last_stages.append({"$project": projection})
+    pipeline = [
+        {"$match": {"session_id": session_id}},
+        {"$facet": {"count": [{"$count": "n"}], "last": last_stages}},
+    ]
+    result = await coll.aggregate(pipeline).to_list(length=1)
+    facet = result[0] if result else {}
+    count = facet["count"][0]["n"] if facet.get("count") else 0
+    last = facet["last"][0] if facet.get("last") else None
+    return count, last
@@ -1,14 +1,16 @@
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class GenerateRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     # Either send full code or a patch; session_id is used to resolve previous code
     session_id: Optional[str] = None
     mode: Optional[str] = None  # 'full' or 'patch' (optional)
-    code: Optional[str] = None  # required when mode=='full'
-    patch: Optional[str] = None  # required when mode=='patch'
+    code: Optional[str] = Field(default=None, repr=False)  # required when mode=='full'
+    patch: Optional[str] = Field(default=None, repr=False)  # required when mode=='patch'
     metrics: Optional[dict] = None  # present in full mode
     metrics_patch: Optional[dict] = None  # present in patch mode
     # Full JSON of the currently selected question from the UI
@@ -16,6 +18,6 @@ class GenerateRequest(BaseModel):
 
 
 class GenerateResponse(BaseModel):
-    response: str
-
+    model_config = ConfigDict(extra="ignore")
 
+    response: str = Field(repr=False)
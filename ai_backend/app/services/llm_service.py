@@ -1,93 +1,218 @@
 import asyncio
+import io
+import itertools
 import json
+import logging
+import os
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Final, Optional
+
+from cachetools import LRUCache
 
 from ai_backend.llm import generate_response
-from ai_backend.app.utils.llm_logger import append_prompt_response
+from ai_backend.app.utils.llm_logger import enqueue_prompt_response
 from ai_backend.app.repositories.snapshots import (
     insert_snapshot,
+    insert_snapshots,
     get_last_snapshot_by_session,
     get_snapshots_by_session,
+    get_snapshot_stats_by_session,
     count_snapshots_by_session,
 )
 from ai_backend.app.db.node_mongo import find_session_by_id
 from diff_match_patch import diff_match_patch
 
+try:
+    import fast_diff_match_patch as _fast_dmp
+except ImportError:
+    _fast_dmp = None
+
+
+logger = logging.getLogger(__name__)
+
+# Strong references to fire-and-forget tasks so they are not collected mid-flight
+_background_tasks: set[asyncio.Task] = set()
+
+# Soft cap on each rendered Mongo context section (measured in characters via StringIO.tell())
+MAX_CTX_BYTES = int(os.getenv("MAX_CTX_BYTES", "16384"))
+
+# Only these fields are read back from snapshots; skip the large prompt/response blobs
+_SNAPSHOT_PROJECTION = {"code": 1, "metrics": 1, "created_at": 1}
+
+# Snapshot inserts are grouped into insert_many batches by a single writer task
+_SNAPSHOT_BATCH_MAX = 64
+_SNAPSHOT_BATCH_WAIT_S = 0.1
+_SNAPSHOT_QUEUE_MAX = 10_000
+_SNAPSHOT_Q: Optional[asyncio.Queue] = None
+_SNAPSHOT_TASK: Optional[asyncio.Task] = None
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background task failed: %r", task.exception())
+
+
+def _spawn_background(coro) -> None:
+    """Run a best-effort coroutine without making the caller wait for it."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
+
+
+async def _snapshot_writer(queue: asyncio.Queue) -> None:
+    # A None doc is the shutdown sentinel; everything queued before it is inserted
+    stopping = False
+    while not stopping:
+        batch = [await queue.get()]
+        while len(batch) < _SNAPSHOT_BATCH_MAX and batch[-1] is not None:
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=_SNAPSHOT_BATCH_WAIT_S))
+            except asyncio.TimeoutError:
+                break
+        if batch[-1] is None:
+            stopping = True
+            batch.pop()
+        if not batch:
+            continue
+        try:
+            await insert_snapshots(batch)
+        except Exception as exc:
+            logger.warning("Snapshot batch insert failed (%d docs): %r", len(batch), exc)
+
+
+def start_snapshot_writer() -> None:
+    """Start the background task that batches queued snapshots into insert_many calls."""
+    global _SNAPSHOT_Q, _SNAPSHOT_TASK
+    if _SNAPSHOT_TASK is not None and not _SNAPSHOT_TASK.done():
+        return
+    _SNAPSHOT_Q = asyncio.Queue(maxsize=_SNAPSHOT_QUEUE_MAX)
+    _SNAPSHOT_TASK = asyncio.create_task(_snapshot_writer(_SNAPSHOT_Q))
+
+
+async def stop_snapshot_writer() -> None:
+    """Stop the snapshot writer after it has inserted anything still queued."""
+    global _SNAPSHOT_Q, _SNAPSHOT_TASK
+    if _SNAPSHOT_TASK is None:
+        return
+    if not _SNAPSHOT_TASK.done():
+        # Wait for room rather than dropping the sentinel on a full queue
+        await _SNAPSHOT_Q.put(None)
+        await _SNAPSHOT_TASK
+    _SNAPSHOT_Q = None
+    _SNAPSHOT_TASK = None
+
+
+def _enqueue_snapshot(doc: dict) -> None:
+    if _SNAPSHOT_TASK is None or _SNAPSHOT_TASK.done():
+        start_snapshot_writer()
+    try:
+        _SNAPSHOT_Q.put_nowait(doc)
+    except asyncio.QueueFull:
+        # Writer is behind; insert this one on its own rather than drop it
+        _spawn_background(insert_snapshot(doc))
+
+
+_PROMPT_HEADER: Final[str] = "CURRENT CODE:"
 
-def _build_prompt(code: str, metrics: Optional[dict] = None, context_sections: Optional[list[str]] = None) -> str:
-    parts = ["CURRENT CODE:", code]
+
+def _build_prompt(code: str, metrics: Optional[dict] = None, context: Optional[str] = None) -> str:
+    parts = [_PROMPT_HEADER, code]
     if metrics:
         parts.append("")
         parts.append("METRICS:")
         for k, v in metrics.items():
             parts.append(f"- {k}: {v}")
-    if context_sections:
-        for section in context_sections:
-            parts.append("")
-            parts.append(section)
+    if context:
+        parts.append("")
+        parts.append(context)
     return "\n".join(parts)
 
 
-async def _build_compact_context_from_mongo(session_id: Optional[str]) -> list[str]:
-    if not session_id:
-        return []
-    sections: list[str] = []
+def _write_section(buf: io.StringIO, text: str) -> None:
+    # Sections are separated by a blank line in the final prompt
+    if buf.tell():
+        buf.write("\n\n")
+    buf.write(text)
+
+
+async def _prefetched_stats(session_id: str, last: dict) -> tuple[int, dict]:
+    return await count_snapshots_by_session(session_id), last
+
+
+_ENTRY_TMPL: Final[str] = "[ts={ts}] '{content}'{metrics}"
+_LINE_TMPL: Final[str] = "- L{line}: {entries}"
+
+
+def _render_context(last: Optional[dict], node_session: Optional[dict]) -> str:
+    """Render the LATEST METRICS / LINE HISTORY / RECENT RUNS prompt sections.
+
+    LINE HISTORY and RECENT RUNS each get their own MAX_CTX_BYTES budget, so a long
+    history can't push the run results out; a section that hits it ends with "(truncated)".
+    """
+    buf = io.StringIO()
     try:
         # Latest metrics from our ai_backend snapshots
-        last = await get_last_snapshot_by_session(session_id)
         if last and last.get("metrics"):
-            sections.append("LATEST METRICS:")
+            _write_section(buf, "LATEST METRICS:")
             for k, v in (last.get("metrics") or {}).items():
-                sections.append(f"- {k}: {v}")
+                _write_section(buf, f"- {k}: {v}")
 
         # Compact line history with actual values from Node session
-        node_session = await find_session_by_id(session_id)
         if node_session and node_session.get("lineHistory"):
             lh = node_session.get("lineHistory") or {}
-            lines_added = 0
-            sections.append("LINE HISTORY:")
+            _write_section(buf, "LINE HISTORY:")
+            section_start = buf.tell()
+            truncated = False
+            # Only lines that have recorded versions are rendered
+            candidates = (
+                (line, arr)
+                for line, arr in (lh.items() if isinstance(lh, dict) else lh)
+                if isinstance(arr, list) and arr
+            )
+            rendered = 0
             # Show up to 50 lines; for each, last 3 versions with content and metrics
-            for line, arr in (lh.items() if isinstance(lh, dict) else lh):
+            for line, lst in candidates:
                 try:
-                    lst = arr if isinstance(arr, list) else []
-                    if not lst:
-                        continue
+                    # Entries are collected first so a failing entry can't leave a partial line in buf
+                    entries = []
                     # Take the last 3 entries for this line
-                    tail = lst[-3:]
-                    # Build readable entries
-                    pretty_entries = []
-                    for e in tail:
-                        ts = e.get("timestamp") if isinstance(e, dict) else None
-                        content = e.get("content") if isinstance(e, dict) else None
-                        metrics_obj = e.get("metrics") if isinstance(e, dict) else None
+                    for e in lst[-3:]:
+                        if not isinstance(e, dict):
+                            continue
+                        content = e.get("content")
+                        metrics_obj = e.get("metrics")
                         # Trim content to avoid huge prompts
-                        if isinstance(content, str) and len(content) > 100:
-                            content_display = content[:100] + "…"
+                        if isinstance(content, str):
+                            content_display = content[:100] + "…" if content[100:101] else content
                         else:
                             content_display = content if content is not None else ""
                         # Render metrics key-values if present (compact)
                         if isinstance(metrics_obj, dict) and metrics_obj:
-                            items = []
-                            for mk, mv in list(metrics_obj.items())[:8]:
-                                items.append(f"{mk}={mv}")
-                            metrics_display = " {" + ", ".join(items) + "}"
+                            metrics_display = " {" + ", ".join(f"{mk}={mv}" for mk, mv in itertools.islice(metrics_obj.items(), 8)) + "}"
                         else:
                             metrics_display = ""
-                        pretty_entries.append(f"[ts={ts}] '{content_display}'{metrics_display}")
-                    sections.append(f"- L{line}: " + " | ".join(pretty_entries))
-                    lines_added += 1
-                    if lines_added >= 50:
-                        sections.append("(truncated)")
+                        entries.append(_ENTRY_TMPL.format_map({"ts": e.get("timestamp"), "content": content_display, "metrics": metrics_display}))
+                    # A line with no well-formed entries adds nothing to the prompt
+                    if not entries:
+                        continue
+                    _write_section(buf, _LINE_TMPL.format_map({"line": line, "entries": " | ".join(entries)}))
+                    rendered += 1
+                    if rendered >= 50 or buf.tell() - section_start > MAX_CTX_BYTES:
+                        truncated = True
                         break
                 except Exception:
                     continue
+            if truncated:
+                _write_section(buf, "(truncated)")
 
         # Recent chat-like context if available
         if node_session and node_session.get("all_submissions"):
             subs = node_session.get("all_submissions") or []
             tail = subs[-3:]
-            sections.append("RECENT RUNS (last 3):")
+            _write_section(buf, "RECENT RUNS (last 3):")
+            section_start = buf.tell()
             for s in tail:
                 t = s.get("timestamp")
                 out = (s.get("output") or "").strip()
@@ -96,27 +221,131 @@ async def _build_compact_context_from_mongo(session_id: Optional[str]) -> list[s
                 max_len = 1000
                 out_disp = out if len(out) <= max_len else out[:max_len] + "…"
                 err_disp = err if len(err) <= max_len else err[:max_len] + "…"
-                sections.append(f"- ts={t}\n  output:\n{out_disp}\n  error:\n{err_disp}")
+                _write_section(buf, f"- ts={t}\n  output:\n{out_disp}\n  error:\n{err_disp}")
+                if buf.tell() - section_start > MAX_CTX_BYTES:
+                    _write_section(buf, "(truncated)")
+                    break
 
     except Exception:
         pass
-    return sections
+    return buf.getvalue()
+
+
+async def _build_compact_context_from_mongo(session_id: Optional[str], prefetched_last: Optional[dict] = None) -> tuple[Optional[int], str]:
+    """Return (snapshot count, rendered context) for a session.
+
+    The snapshot stats and the Node session are fetched concurrently and the
+    result is rendered by _render_context. The count is None when it could
+    not be read from Mongo. When the caller already holds the latest
+    snapshot, pass it as prefetched_last so only the count is read.
+    """
+    if not session_id:
+        return None, ""
+    if prefetched_last is not None:
+        stats_coro = _prefetched_stats(session_id, prefetched_last)
+    else:
+        stats_coro = get_snapshot_stats_by_session(session_id, _SNAPSHOT_PROJECTION)
+    # Both lookups are independent; overlap them and tolerate either failing
+    stats, node_session = await asyncio.gather(
+        stats_coro,
+        find_session_by_id(session_id),
+        return_exceptions=True,
+    )
+    if isinstance(stats, BaseException):
+        count, last = None, None
+    else:
+        count, last = stats
+    if isinstance(node_session, BaseException):
+        node_session = None
+    return count, _render_context(last, node_session)
+
+
+_FAST_DMP_OPS = {"=": diff_match_patch.DIFF_EQUAL, "-": diff_match_patch.DIFF_DELETE, "+": diff_match_patch.DIFF_INSERT}
+
 
+class _FastDiffMatchPatch(diff_match_patch):
+    """diff_match_patch with the diff/match inner loops delegated to the C++ binding.
 
+    Patch parsing and application stay in the pure-Python class; only the
+    expensive Myers diff and bitap match used by patch_apply are swapped out.
+    """
+
+    def diff_main(self, text1, text2, checklines=True, deadline=None):
+        diffs = _fast_dmp.diff(
+            text1,
+            text2,
+            timelimit=self.Diff_Timeout,
+            checklines=checklines,
+            cleanup="No",
+            counts_only=False,
+        )
+        return [(_FAST_DMP_OPS[op], chunk) for op, chunk in diffs]
+
+    def match_main(self, text, pattern, loc):
+        return _fast_dmp.match(
+            text,
+            pattern,
+            loc,
+            match_threshold=self.Match_Threshold,
+            match_distance=self.Match_Distance,
+        )
+
+
+# Combined patch + code size up to which a patch is applied on the event loop
+_INLINE_PATCH_CHARS = 8192
+
+
+@lru_cache(maxsize=1)
 def _safe_get_dmp():
+    # One shared instance: patch_fromText/patch_apply keep no per-call state
     try:
-        return diff_match_patch()
+        dmp = _FastDiffMatchPatch() if _fast_dmp is not None else diff_match_patch()
     except Exception:
         return None
+    dmp.Diff_Timeout = 1.0
+    dmp.Match_Threshold = 0.5
+    return dmp
 
 async def _apply_patch(previous_code: str, patch_text: str) -> str:
     dmp = _safe_get_dmp()
     if not dmp:
         # Fallback: if we can't patch, return previous to avoid breaking
         return previous_code
-    patches = dmp.patch_fromText(patch_text)
-    new_text, results = dmp.patch_apply(patches, previous_code)
-    return new_text
+
+    def _run() -> str:
+        patches = dmp.patch_fromText(patch_text)
+        new_text, results = dmp.patch_apply(patches, previous_code)
+        return new_text
+
+    # Small edits finish faster than a thread hand-off; larger ones are pure-Python
+    # CPU work that shouldn't stall the event loop
+    if len(patch_text) + len(previous_code) <= _INLINE_PATCH_CHARS:
+        return _run()
+    return await asyncio.to_thread(_run)
+
+
+# Question fields in preference order; the first non-empty string wins
+_CANDIDATE_QUESTION_KEYS: Final[tuple[str, ...]] = (
+    "Full_question",
+    "full_question",
+    "fullQuestion",
+    "problem",
+    "problem_text",
+    "problemStatement",
+    "problem_statement",
+    "description",
+    "short_description",
+    "statement",
+    "question",
+    "prompt",
+    "body",
+    "text",
+    "content",
+)
+_QUESTION_KEYS: Final[dict[str, int]] = {key: rank for rank, key in enumerate(_CANDIDATE_QUESTION_KEYS)}
+
+# question id -> (source key, raw value, extracted text)
+_QUESTION_TEXT_CACHE: LRUCache = LRUCache(maxsize=1024)
 
 
 def _extract_question_text(question_json: Optional[object]) -> Optional[str]:
@@ -130,59 +359,30 @@ def _extract_question_text(question_json: Optional[object]) -> Optional[str]:
         stripped = question_json.strip()
         return stripped or None
     if isinstance(question_json, dict):
-        candidate_keys = [
-            "Full_question",
-            "full_question",
-            "fullQuestion",
-            "problem",
-            "problem_text",
-            "problemStatement",
-            "problem_statement",
-            "description",
-            "short_description",
-            "statement",
-            "question",
-            "prompt",
-            "body",
-            "text",
-            "content",
-        ]
-        for key in candidate_keys:
-            try:
-                value = question_json.get(key)
-            except Exception:
-                value = None
-            if isinstance(value, str):
+        # Same problem is sent on every tick (and by every session solving it)
+        qid = question_json.get("id", question_json.get("_id"))
+        cache_key = qid if isinstance(qid, (str, int)) else None
+        if cache_key is not None:
+            cached = _QUESTION_TEXT_CACHE.get(cache_key)
+            # Re-check the source field so an edited question isn't served stale
+            if cached is not None and question_json.get(cached[0]) == cached[1]:
+                return cached[2]
+        # Single pass over the dict; the lowest-ranked non-empty string wins
+        best_rank, best_key, best = len(_QUESTION_KEYS), None, None
+        for key, value in question_json.items():
+            rank = _QUESTION_KEYS.get(key)
+            if rank is not None and rank < best_rank and isinstance(value, str):
                 stripped = value.strip()
                 if stripped:
-                    return stripped
+                    best_rank, best_key, best = rank, key, stripped
+        if cache_key is not None and best_key is not None:
+            _QUESTION_TEXT_CACHE[cache_key] = (best_key, question_json[best_key], best)
+        return best
     return None
 
 
-async def generate_text_response_full(code: str, session_id: Optional[str], metrics: Optional[dict] = None, question_json: Optional[dict] = None) -> str:
-    # Progressive timestamp in seconds: 30, 60, 90, ... based on snapshot count
-    progressive_ts = None
-    try:
-        if session_id:
-            count = await count_snapshots_by_session(session_id)
-            progressive_ts = (count + 1) * 60  # next tick in seconds
-    except Exception:
-        progressive_ts = None
-
-    context_sections = await _build_compact_context_from_mongo(session_id)
-    # Include only the plain problem text (not the full question JSON)
-    question_text = _extract_question_text(question_json)
-    if question_text:
-        context_sections = ["QUESTION:", question_text] + context_sections
-    # Merge in progressive timestamp if metrics is used
-    use_metrics = dict(metrics or {})
-    if progressive_ts is not None:
-        use_metrics["progressiveSeconds"] = progressive_ts
-
-    prompt = _build_prompt(code, use_metrics or None, context_sections)
-    
-    # System prompt to guide the LLM's behavior
-    system_prompt = """You are an advanced AI assistant tasked with analyzing a developer's coding session to determine if they are struggling. Your goal is to decide whether to escalate the situation to a more powerful Large Language Model (LLM) for assistance.
+# System prompt to guide the LLM's behavior
+_SYSTEM_PROMPT_INSTRUCTIONS: Final[str] = """You are an advanced AI assistant tasked with analyzing a developer's coding session to determine if they are struggling. Your goal is to decide whether to escalate the situation to a more powerful Large Language Model (LLM) for assistance.
 Follow these instructions precisely to perform your analysis.
 Task:
 Analyze the provided user coding session data to determine if the user is struggling and whether a more powerful Large Language Model (LLM) should be called for assistance. The analysis must be performed step-by-step, and the final output must be a single JSON object with two keys: 'should_call_llm' and 'reasoning'.
@@ -194,7 +394,8 @@ Step 3: Historical Context - Review the full LINE HISTORY for the lines identifi
 Step 4: Synthesize and Decide - Based on the combined evidence from the code, metrics, and history, make a holistic judgment. Is the user experiencing a temporary hiccup or a more significant roadblock? If multiple indicators of struggle are present (e.g., syntax errors, high churn, long delays, no progress over time) and the user's code is not progressing, the user is likely struggling.
 Step 5: Formulate Response - Create the final JSON output. The should_call_llm flag must be a boolean (true or false). The reasoning must be a single string that concisely explains the step-by-step analysis that led to the decision. Do not use sub-headers or nested structures within the reasoning string.
  
-Few-Shot Examples:
+"""
+_SYSTEM_PROMPT_EXAMPLES: Final[str] = """Few-Shot Examples:
 CONTEXT:
 codeCode
 [2025-09-27T20:25:10.018432] session=a1b2c3d4-e5f6-7890-gh12-i3j4k5l6m7n8
@@ -294,7 +495,8 @@ codeJSON
 The user understands the abstract algorithm but is blocked by a core language feature. The combination of a persistent `TypeError` and clear metric-based evidence of intense struggle on the specific line causing the error indicates they need help. An LLM can effectively explain string immutability and provide the correct Pythonic solutions (e.g., converting to a list or building a new string), making intervention highly appropriate."
 }
  
-Output Format:
+"""
+_SYSTEM_PROMPT_FORMAT: Final[str] = """Output Format:
 Your response MUST follow this two-part structure:
 Part 1: Step-by-Step Thinking
 Write out your analysis by following the thinking process steps below. Use headers for each step (e.g., "Step 1: Code Analysis"). Be as verbose as necessary to explain your reasoning.
@@ -316,22 +518,49 @@ codeJSON
   },
   "required": ["should_call_llm", "reasoning"]
 }"""
-    
-    # Print full prompts to backend stdout for visibility during development
-    try:
-        print("\n================ SYSTEM PROMPT ================\n")
-        print(system_prompt)
-        print("\n================= USER PROMPT =================\n")
-        print(prompt)
-        print("\n===============================================\n")
-    except Exception:
-        pass
+# Instructions + output format only; used when the request is already large
+_SYSTEM_PROMPT_CORE: Final[str] = _SYSTEM_PROMPT_INSTRUCTIONS + _SYSTEM_PROMPT_FORMAT
+_SYSTEM_PROMPT: Final[str] = _SYSTEM_PROMPT_INSTRUCTIONS + _SYSTEM_PROMPT_EXAMPLES + _SYSTEM_PROMPT_FORMAT
+_SYSTEM_PROMPT_CORE_LEN: Final[int] = len(_SYSTEM_PROMPT_CORE)
+
+# Above this many estimated input tokens (~4 chars each) the few-shot examples are left out
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+
+def _select_system_prompt(prompt: str) -> str:
+    if (len(prompt) + _SYSTEM_PROMPT_CORE_LEN) // 4 > PROMPT_TOKEN_BUDGET:
+        return _SYSTEM_PROMPT_CORE
+    return _SYSTEM_PROMPT
+
+
+async def generate_text_response_full(code: str, session_id: Optional[str], metrics: Optional[dict] = None, question_json: Optional[dict] = None, _prefetched_last: Optional[dict] = None) -> str:
+    if session_id:
+        count, context = await _build_compact_context_from_mongo(session_id, _prefetched_last)
+    else:
+        count, context = None, ""
+    # Progressive timestamp in seconds: 30, 60, 90, ... based on snapshot count
+    progressive_ts = (count + 1) * 60 if count is not None else None  # next tick in seconds
+    # Include only the plain problem text (not the full question JSON)
+    question_text = _extract_question_text(question_json)
+    if question_text:
+        context = f"QUESTION:\n\n{question_text}\n\n{context}" if context else f"QUESTION:\n\n{question_text}"
+    # Merge in progressive timestamp if metrics is used
+    use_metrics = dict(metrics or {})
+    if progressive_ts is not None:
+        use_metrics["progressiveSeconds"] = progressive_ts
+
+    prompt = _build_prompt(code, use_metrics or None, context)
+    system_prompt = _select_system_prompt(prompt)
+
+    # Full prompt dump for development; enable DEBUG on this logger to see it
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("SYSTEM PROMPT (%d chars)\n%s\nUSER PROMPT (%d chars)\n%s", len(system_prompt), system_prompt, len(prompt), prompt)
 
-    response = await asyncio.to_thread(generate_response, prompt, system_prompt)
+    response = await generate_response(prompt, system_prompt)
 
     # Best-effort file log
     try:
-        append_prompt_response(prompt, response, session_id=session_id, system_prompt=system_prompt)
+        enqueue_prompt_response(prompt, response, session_id=session_id, system_prompt=system_prompt)
     except Exception:
         pass
 
@@ -345,7 +574,7 @@ codeJSON
             "response": response,
             "created_at": datetime.utcnow(),
         }
-        await insert_snapshot(doc)
+        _enqueue_snapshot(doc)
     except Exception:
         pass
 
@@ -353,12 +582,13 @@ codeJSON
 
 
 async def generate_text_response_patch(patch_text: str, session_id: Optional[str], metrics_patch: Optional[dict] = None, question_json: Optional[dict] = None) -> str:
+    last = None
     if not session_id:
         # Cannot apply patch without a session context; fallback to no-op code
         code = ""
         merged_metrics = {}
     else:
-        last = await get_last_snapshot_by_session(session_id)
+        last = await get_last_snapshot_by_session(session_id, _SNAPSHOT_PROJECTION)
         prev_code = last.get("code") if last else ""
         code = await _apply_patch(prev_code, patch_text)
         prev_metrics = last.get("metrics") if last else {}
@@ -366,6 +596,7 @@ async def generate_text_response_patch(patch_text: str, session_id: Optional[str
         if metrics_patch:
             merged_metrics.update(metrics_patch)
 
-    return await generate_text_response_full(code, session_id, merged_metrics, question_json)
+    # Hand the snapshot down so context building doesn't fetch it a second time
+    return await generate_text_response_full(code, session_id, merged_metrics, question_json, _prefetched_last=last)
 
 
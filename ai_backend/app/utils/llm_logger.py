@@ -1,8 +1,18 @@
+import asyncio
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 
+# Records waiting to be appended by the background writer (see start_log_writer)
+_LOG_Q: Optional[asyncio.Queue] = None
+_LOG_TASK: Optional[asyncio.Task] = None
+_LOG_BATCH_MAX = 100
+_LOG_BATCH_WAIT_S = 0.05
+
+
+@lru_cache(maxsize=1)
 def _get_log_path() -> Path:
     base_dir = Path(__file__).resolve().parents[2]  # points to ai_backend/
     tmp_dir = base_dir / "tmp"
@@ -10,25 +20,91 @@ def _get_log_path() -> Path:
     return tmp_dir / "llm_responses.log"
 
 
+def _format_record(prompt: str, response: str, session_id: Optional[str] = None, system_prompt: Optional[str] = None) -> str:
+    timestamp = datetime.utcnow().isoformat()
+    sid = session_id or "-"
+    separator = "-" * 80
+    parts = [f"[{timestamp}] session={sid}\n"]
+    if system_prompt:
+        parts.append("SYSTEM PROMPT:\n")
+        parts.append(f"{system_prompt}\n\n")
+    parts.append("PROMPT:\n")
+    parts.append(f"{prompt}\n\n")
+    parts.append("RESPONSE:\n")
+    parts.append(f"{response}\n")
+    parts.append(f"{separator}\n")
+    return "".join(parts)
+
+
+def _write_records(records: list[str]) -> None:
+    log_path = _get_log_path()
+    payload = "".join(records)
+    try:
+        f = log_path.open("a", encoding="utf-8")
+    except FileNotFoundError:
+        # tmp/ was removed after the path was first resolved
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        f = log_path.open("a", encoding="utf-8")
+    with f:
+        f.write(payload)
+
+
 def append_prompt_response(prompt: str, response: str, session_id: Optional[str] = None, system_prompt: Optional[str] = None) -> None:
     """Append a prompt/response pair to a temp log file with a timestamp.
 
     This is intended for temporary, best-effort logging during development.
     """
-    timestamp = datetime.utcnow().isoformat()
-    sid = session_id or "-"
-    separator = "-" * 80
+    _write_records([_format_record(prompt, response, session_id=session_id, system_prompt=system_prompt)])
+
+
+async def _log_writer(queue: asyncio.Queue) -> None:
+    # A None record is the shutdown sentinel; everything queued before it is written
+    stopping = False
+    while not stopping:
+        batch = [await queue.get()]
+        while len(batch) < _LOG_BATCH_MAX and batch[-1] is not None:
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=_LOG_BATCH_WAIT_S))
+            except asyncio.TimeoutError:
+                break
+        if batch[-1] is None:
+            stopping = True
+            batch.pop()
+        if not batch:
+            continue
+        try:
+            await asyncio.to_thread(_write_records, batch)
+        except Exception:
+            # Best-effort logging only
+            pass
 
-    log_path = _get_log_path()
-    with log_path.open("a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] session={sid}\n")
-        if system_prompt:
-            f.write("SYSTEM PROMPT:\n")
-            f.write(f"{system_prompt}\n\n")
-        f.write("PROMPT:\n")
-        f.write(f"{prompt}\n\n")
-        f.write("RESPONSE:\n")
-        f.write(f"{response}\n")
-        f.write(f"{separator}\n")
 
+def start_log_writer() -> None:
+    """Start the background task that batches queued log records into single writes."""
+    global _LOG_Q, _LOG_TASK
+    if _LOG_TASK is not None and not _LOG_TASK.done():
+        return
+    _LOG_Q = asyncio.Queue()
+    _LOG_TASK = asyncio.create_task(_log_writer(_LOG_Q))
 
+
+async def stop_log_writer() -> None:
+    """Stop the background writer after it has flushed anything still queued."""
+    global _LOG_Q, _LOG_TASK
+    if _LOG_TASK is None:
+        return
+    if not _LOG_TASK.done():
+        _LOG_Q.put_nowait(None)
+        await _LOG_TASK
+    _LOG_Q = None
+    _LOG_TASK = None
+
+
+def enqueue_prompt_response(prompt: str, response: str, session_id: Optional[str] = None, system_prompt: Optional[str] = None) -> None:
+    """Queue a prompt/response pair for the background writer (no file I/O on the caller).
+
+    Must be called from within a running event loop; starts the writer lazily.
+    """
+    if _LOG_TASK is None or _LOG_TASK.done():
+        start_log_writer()
+    _LOG_Q.put_nowait(_format_record(prompt, response, session_id=session_id, system_prompt=system_prompt))
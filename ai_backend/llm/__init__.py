@@ -0,0 +1,62 @@
+"""Provider-agnostic LLM entry points.
+
+Backends live in sibling modules exposing an async ``stream(prompt,
+system_prompt, temperature, api_key)`` generator. A backend module is only
+imported (and its client/env validation run) on first use.
+"""
+import importlib
+import logging
+import re
+from functools import cache
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Provider name -> backend module, imported lazily
+_PROVIDERS: dict[str, str] = {
+    "gemini": "ai_backend.llm.gemini_backend",
+}
+
+# First fenced block in the reply, with or without a "json" tag
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.+?)\s*```", re.DOTALL)
+
+
+@cache
+def _get_backend(provider: str):
+    try:
+        module_path = _PROVIDERS[provider]
+    except KeyError:
+        raise ValueError(f"Unknown LLM provider: {provider!r}") from None
+    return importlib.import_module(module_path)
+
+
+async def generate_response_stream(prompt, system_prompt=None, temperature=0.7, api_key: str | None = None, *, provider: str = "gemini"):
+    async for piece in _get_backend(provider).stream(prompt, system_prompt, temperature, api_key):
+        yield piece
+
+
+def _log_json_block(response_text: str) -> None:
+    # Parse JSON from LLM output (debug visibility only; the raw text is returned)
+    m = _JSON_FENCE.search(response_text)
+    if not m:
+        logger.debug("No JSON block found in LLM output")
+        return
+    json_string = m.group(1)
+    logger.debug("Extracted JSON from LLM output: %s", json_string)
+    try:
+        parsed_json = orjson.loads(json_string)
+        logger.debug("Parsed JSON object: %s", parsed_json)
+    except orjson.JSONDecodeError as parse_error:
+        logger.debug("Error parsing JSON from LLM output: %s", parse_error)
+
+
+async def generate_response(prompt, system_prompt=None, temperature=0.7, api_key: str | None = None, *, provider: str = "gemini"):
+    # Non-streaming wrapper: collect the chunks and join once
+    pieces = [piece async for piece in generate_response_stream(prompt, system_prompt, temperature, api_key, provider=provider)]
+    response_text = "".join(pieces)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        _log_json_block(response_text)
+    
+    return response_text
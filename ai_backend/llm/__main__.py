@@ -0,0 +1,5 @@
+import asyncio
+
+from ai_backend.llm import generate_response
+
+print(asyncio.run(generate_response("What is the name of this model?")))
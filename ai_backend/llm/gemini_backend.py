@@ -0,0 +1,43 @@
+from langchain_google_genai import GoogleGenerativeAI
+from functools import lru_cache
+
+# Use GEMINI_API_KEY environment variable
+import os
+AI_BACKEND_GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+if not AI_BACKEND_GEMINI_API_KEY:
+    raise ValueError("GEMINI_API_KEY environment variable is required")
+
+print(f"🔑 AI Backend using Gemini API key: {AI_BACKEND_GEMINI_API_KEY[:10]}...{AI_BACKEND_GEMINI_API_KEY[-4:]}")
+
+MODEL = "gemini-flash-latest"
+
+
+@lru_cache(maxsize=8)
+def _get_llm(model: str, temperature: float, api_key: str) -> GoogleGenerativeAI:
+    # Reused across calls so the client and its connection pool survive between requests
+    return GoogleGenerativeAI(
+        model=model,
+        google_api_key=api_key,
+        temperature=temperature,
+    )
+
+
+async def stream(prompt, system_prompt=None, temperature=0.7, api_key: str | None = None):
+    key_to_use = (api_key or AI_BACKEND_GEMINI_API_KEY) or ""
+    if not key_to_use:
+        raise ValueError("Missing API key: set GEMINI_API_KEY or pass api_key explicitly")
+    
+    # Combine system prompt and user prompt
+    full_prompt = prompt
+    if system_prompt:
+        full_prompt = f"{system_prompt}\n\n{prompt}"
+    
+    llm = _get_llm(MODEL, temperature, key_to_use)
+    
+    # Yield text as it arrives so callers can start consuming before the completion finishes;
+    # closing the generator early drops the upstream request
+    async for chunk in llm.astream(full_prompt):
+        text = chunk.content if hasattr(chunk, 'content') else chunk
+        if text:
+            yield text
@@ -62,6 +62,75 @@ interface ChatMessage {
   timestamp: Date;
 }
 
+// POST a chat turn to /chat/stream and read its Server-Sent Events. onText receives the
+// reply text as it grows; resolves with the final /chat payload. Falls back to plain /chat
+// only when the stream endpoint is unreachable or missing, so a turn the backend already
+// recorded is never sent twice.
+async function streamChat(payload: any, onText: (text: string) => void): Promise<any> {
+  let resp: Response;
+  try {
+    resp = await fetch('http://localhost:5000/chat/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload),
+    });
+  } catch {
+    const fallback = await axios.post('http://localhost:5000/chat', payload);
+    return fallback.data;
+  }
+  if (resp.status === 404 || resp.status === 405) {
+    const fallback = await axios.post('http://localhost:5000/chat', payload);
+    return fallback.data;
+  }
+  if (!resp.ok) {
+    const err = await resp.json().catch(() => null);
+    throw new Error(err?.details || err?.error || `Chat stream failed (${resp.status})`);
+  }
+  let buffer = '';
+  let text = '';
+  // Consume complete frames from buffer; returns the done payload once it arrives
+  const readFrames = (): any => {
+    let sep = buffer.indexOf('\n\n');
+    while (sep !== -1) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      sep = buffer.indexOf('\n\n');
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      const parsed = JSON.parse(data);
+      if (event === 'done') return parsed;
+      if (event === 'error') throw new Error(parsed.details || parsed.error || 'Chat stream failed');
+      if (parsed.text) {
+        text += parsed.text;
+        onText(text);
+      }
+    }
+    return undefined;
+  };
+  if (!resp.body) {
+    // No readable stream in this browser; parse the whole event stream at once
+    buffer = await resp.text();
+    const result = readFrames();
+    if (result !== undefined) return result;
+    throw new Error('Chat stream ended without a result');
+  }
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const result = readFrames();
+    if (result !== undefined) return result;
+  }
+  throw new Error('Chat stream ended without a result');
+}
+
 interface ChatBoxProps {
   getCurrentCode: () => string;
   currentQuestion: QuestionItem | null;
@@ -94,28 +163,39 @@ const ChatBox: React.FC<ChatBoxProps> = ({ getCurrentCode, currentQuestion }) =>
     scrollToBottom();
   }, [messages]);
 
-  // Poll audio backend for assistant messages produced by queued events
+  // Receive assistant messages produced by queued events: pushed over SSE, polled as a fallback
   useEffect(() => {
     let cancelled = false;
     let timer: number | null = null;
+    let source: EventSource | null = null;
+    const deliver = async (msgs: any[]) => {
+      if (cancelled || !msgs.length) return;
+      const toAppend = msgs.map((m: any, idx: number) => ({
+        id: `${Date.now()}-${idx}`,
+        text: String(m?.content ?? ''),
+        sender: 'bot' as const,
+        timestamp: new Date()
+      }));
+      setMessages(prev => [...prev, ...toAppend]);
+      // Auto-speak newest one
+      const last = toAppend[toAppend.length - 1];
+      if (last && last.text) {
+        try { await textToSpeech.speakWithBrowser(last.text); } catch {};
+      }
+    };
+    // ETag of the last poll; the backend answers 304 until new messages are queued
+    let etag: string | null = null;
     const poll = async () => {
       try {
         if (!sessionId) return;
-        const resp = await axios.get('http://localhost:5000/chat/events/poll', { params: { sessionId } });
-        const msgs = Array.isArray(resp.data?.messages) ? resp.data.messages : [];
-        if (!cancelled && msgs.length) {
-          const toAppend = msgs.map((m: any, idx: number) => ({
-            id: `${Date.now()}-${idx}`,
-            text: String(m?.content ?? ''),
-            sender: 'bot' as const,
-            timestamp: new Date()
-          }));
-          setMessages(prev => [...prev, ...toAppend]);
-          // Auto-speak newest one
-          const last = toAppend[toAppend.length - 1];
-          if (last && last.text) {
-            try { await textToSpeech.speakWithBrowser(last.text); } catch {};
-          }
+        const resp = await axios.get('http://localhost:5000/chat/events/poll', {
+          params: { sessionId },
+          headers: etag ? { 'If-None-Match': etag } : undefined,
+          validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+        });
+        etag = resp.headers['etag'] || etag;
+        if (resp.status !== 304) {
+          await deliver(Array.isArray(resp.data?.messages) ? resp.data.messages : []);
         }
       } catch {}
       if (!cancelled) {
@@ -123,11 +203,19 @@ const ChatBox: React.FC<ChatBoxProps> = ({ getCurrentCode, currentQuestion }) =>
         timer = window.setTimeout(poll, 1500);
       }
     };
-    // start polling
-    // @ts-ignore
-    timer = window.setTimeout(poll, 1000);
+    if (sessionId && typeof window.EventSource !== 'undefined') {
+      source = new EventSource(`http://localhost:5000/chat/events/stream?sessionId=${encodeURIComponent(sessionId)}`);
+      source.onmessage = (ev: MessageEvent) => {
+        try { deliver([JSON.parse(ev.data)]); } catch {}
+      };
+    } else {
+      // start polling
+      // @ts-ignore
+      timer = window.setTimeout(poll, 1000);
+    }
     return () => {
       cancelled = true;
+      source?.close();
       if (timer) {
         window.clearTimeout(timer as any);
       }
@@ -162,31 +250,31 @@ const ChatBox: React.FC<ChatBoxProps> = ({ getCurrentCode, currentQuestion }) =>
         payload.questionJson = currentQuestion;
         lastQuestionIdRef.current = currentQuestion.id;
       }
-      const response = await axios.post('http://localhost:5000/chat', payload);
+      // Show the reply while it streams in; the final payload replaces the partial text
+      const botId = (Date.now() + 1).toString();
+      const showBotText = (text: string) => {
+        setMessages(prev => prev.some(m => m.id === botId)
+          ? prev.map(m => (m.id === botId ? { ...m, text } : m))
+          : [...prev, { id: botId, text, sender: 'bot' as const, timestamp: new Date() }]);
+      };
+      const data = await streamChat(payload, showBotText);
 
       // Update session ID if provided by backend
-      if (response.data.sessionId && response.data.sessionId !== sessionId) {
-        setSessionId(response.data.sessionId);
+      if (data.sessionId && data.sessionId !== sessionId) {
+        setSessionId(data.sessionId);
       }
 
-      const botMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        text: response.data.response,
-        sender: 'bot',
-        timestamp: new Date()
-      };
-
-      setMessages(prev => [...prev, botMessage]);
+      showBotText(data.response);
       
       // Automatically speak the bot's response
-      if (response.data.response) {
+      if (data.response) {
         // Try browser TTS first since it's more reliable
         try {
-          await textToSpeech.speakWithBrowser(response.data.response);
+          await textToSpeech.speakWithBrowser(data.response);
         } catch (browserTtsError) {
           console.warn('Browser TTS failed, trying Sarvam TTS:', browserTtsError);
           try {
-            await textToSpeech.speak(response.data.response);
+            await textToSpeech.speak(data.response);
           } catch (sarvamTtsError) {
             console.warn('Both TTS methods failed:', sarvamTtsError);
           }
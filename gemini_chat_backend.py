@@ -1,10 +1,18 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from quart import Quart, Response, request, jsonify
+from quart.json.provider import DefaultJSONProvider
+from quart_cors import cors
+from cachetools import TTLCache
 from langchain_google_genai import GoogleGenerativeAI
 import os
-from datetime import datetime
-import uuid
+from datetime import datetime, timezone
+import time
+import secrets
 import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional, Tuple
 import re
@@ -20,8 +28,82 @@ try:
 except Exception:
     _slm_log_path = None  # type: ignore
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend requests
+try:
+    import redis.asyncio as _redis  # type: ignore
+except Exception:
+    _redis = None  # type: ignore
+
+try:
+    import orjson as _orjson  # type: ignore
+except Exception:
+    _orjson = None  # type: ignore
+
+# orjson when installed (several times faster on the prompt/response paths); stdlib json otherwise
+_json_loads = _orjson.loads if _orjson is not None else json.loads
+
+
+def _json_dumps(obj, pretty: bool = False) -> str:
+    """json.dumps(obj, ensure_ascii=False[, indent=2]) equivalent."""
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj, option=_orjson.OPT_INDENT_2 if pretty else 0).decode()
+        except TypeError:
+            # Non-str keys, >64-bit ints, etc.: let stdlib json handle it
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None)
+
+
+class _OrjsonJSONProvider(DefaultJSONProvider):
+    """jsonify() and request.get_json() through orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if _orjson is not None:
+            try:
+                return _orjson.dumps(obj, option=_orjson.OPT_INDENT_2 if kwargs.get("indent") else 0).decode()
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if _orjson is not None:
+            return _orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Compact bodies go straight from orjson's bytes into the response (no str round trip)
+        if _orjson is None or self._app.debug or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = _orjson.dumps(obj) + b"\n"
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+_iso_now_cache = [0, ""]
+
+
+def _utc_now_iso() -> str:
+    """UTC ISO-8601 timestamp at one-second resolution, formatted at most once per second."""
+    now = int(time.time())
+    if now != _iso_now_cache[0]:
+        _iso_now_cache[1] = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        _iso_now_cache[0] = now
+    return _iso_now_cache[1]
+
+
+app = Quart(__name__)
+app.json = _OrjsonJSONProvider(app)
+app = cors(app, allow_origin="*", expose_headers=["ETag"])  # Enable CORS for frontend requests
+
+# Per-process session state. Every handler and session worker runs on this process's event
+# loop and never awaits in the middle of an outbox append or drain, so no locking is needed
+# (which is also why a plain TTLCache is safe here). Idle sessions expire after SESSION_TTL_S
+# and the store never holds more than SESSION_CACHE_MAX of them.
+_SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", "3600"))
+_SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "10000"))
+app.chat_sessions = TTLCache(maxsize=_SESSION_CACHE_MAX, ttl=_SESSION_TTL_S)
 
 # Get API key from environment variable
 api_key = os.getenv("GEMINI_API_KEY")
@@ -56,58 +138,239 @@ PRIORITY = {
 }
 
 
+# Per-session bounds: prompts only read the last 10 turns, and undelivered nudges
+# for a client that stopped polling shouldn't pile up forever
+_MAX_SESSION_MESSAGES = 200
+_MAX_OUTBOX = 256
+
+
 def _get_session(session_id: str):
-    if not hasattr(app, 'chat_sessions'):
-        app.chat_sessions = {}
     sess = app.chat_sessions.get(session_id)
-    if not sess:
+    if sess is not None:
+        # Re-insert so the TTL counts from the last use, not from creation
+        app.chat_sessions[session_id] = sess
+    else:
         sess = {
-            'messages': [],
+            'messages': deque(maxlen=_MAX_SESSION_MESSAGES),
             'question_json': None,
             'help_level': 0,
             'struggle_score': 0,
+            # heapq of (-priority, seq, event): highest priority first, FIFO within a priority
             'queue': [],
-            'processing': False,
-            'outbox': [],
+            # Set by _enqueue_event; wakes the session worker when the queue was empty
+            'queue_ready': asyncio.Event(),
+            '_seq': itertools.count(),
+            'worker': None,
+            'outbox': deque(maxlen=_MAX_OUTBOX),
+            # Set whenever the outbox gains a message; wakes /chat/events/stream
+            'outbox_event': asyncio.Event(),
+            # Count of messages ever added to the outbox; the poll ETag
+            'outbox_seq': 0,
         }
         app.chat_sessions[session_id] = sess
     return sess
 
 
+def _set_question_json(session, question_json) -> None:
+    session['question_json'] = question_json
+    session.pop('_question_block', None)
+
+
+def _question_block(session) -> Optional[str]:
+    """The QUESTION JSON prompt section, serialized once per question rather than every turn."""
+    question_json = session.get('question_json')
+    if not question_json:
+        return None
+    block = session.get('_question_block')
+    if block is None:
+        try:
+            body = _json_dumps(question_json, pretty=True)
+        except Exception:
+            body = str(question_json)
+        block = session['_question_block'] = f"QUESTION JSON:\n{body}\n"
+    return block
+
+
+# -------------------- Optional shared session store (Redis) --------------------
+# With REDIS_URL set (redis://host:6379/0, or unix:///var/run/redis/redis.sock), conversation
+# state (messages, memory scores, question) and the outbox are kept in Redis so any worker can
+# serve a session and idle sessions expire. The in-process dict above still holds per-worker
+# runtime state (event queue, worker task) and a local cache of the conversation.
+REDIS_URL = os.getenv("REDIS_URL")
+_QUESTION_TTL_S = int(os.getenv("QUESTION_TTL_S", "86400"))
+_redis_client = _redis.from_url(REDIS_URL) if (_redis is not None and REDIS_URL) else None
+
+
+def _session_key(session_id: str, part: str) -> str:
+    return f"innov8:sess:{session_id}:{part}"
+
+
+async def _load_session(session_id: str):
+    """Return the local session, refreshed from Redis when the shared store is enabled."""
+    session = _get_session(session_id)
+    if _redis_client is None:
+        return session
+    try:
+        async with _redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(_session_key(session_id, "meta"))
+            pipe.lrange(_session_key(session_id, "messages"), -_MAX_SESSION_MESSAGES, -1)
+            pipe.get(_session_key(session_id, "question"))
+            meta, raw_messages, raw_question = await pipe.execute()
+        if meta:
+            session['help_level'] = int(meta.get(b'help_level') or 0)
+            session['struggle_score'] = int(meta.get(b'struggle_score') or 0)
+        if raw_messages:
+            session['messages'] = deque((_json_loads(m) for m in raw_messages), maxlen=_MAX_SESSION_MESSAGES)
+        if raw_question and raw_question != session.get('_question_raw'):
+            _set_question_json(session, _json_loads(raw_question))
+            session['_question_raw'] = raw_question
+    except Exception:
+        # Store unavailable: keep serving from the local copy
+        pass
+    return session
+
+
+async def _save_session(session_id: str, session, new_messages: List[dict], question_changed: bool = False,
+                        outbox_messages: Optional[List[dict]] = None) -> None:
+    """Append this turn's messages, memory scores and outbox entries to Redis (no-op without the shared store)."""
+    if _redis_client is None:
+        return
+    try:
+        messages_key = _session_key(session_id, "messages")
+        meta_key = _session_key(session_id, "meta")
+        outbox_key = _session_key(session_id, "outbox")
+        async with _redis_client.pipeline(transaction=False) as pipe:
+            if outbox_messages:
+                outbox_seq_key = _session_key(session_id, "outbox_seq")
+                pipe.rpush(outbox_key, *[_json_dumps(m) for m in outbox_messages])
+                pipe.ltrim(outbox_key, -_MAX_OUTBOX, -1)
+                pipe.expire(outbox_key, _SESSION_TTL_S)
+                pipe.incrby(outbox_seq_key, len(outbox_messages))
+                pipe.expire(outbox_seq_key, _SESSION_TTL_S)
+            if new_messages:
+                pipe.rpush(messages_key, *[_json_dumps(m) for m in new_messages])
+                pipe.ltrim(messages_key, -_MAX_SESSION_MESSAGES, -1)
+            pipe.hset(meta_key, mapping={
+                'help_level': int(session.get('help_level') or 0),
+                'struggle_score': int(session.get('struggle_score') or 0),
+            })
+            pipe.expire(messages_key, _SESSION_TTL_S)
+            pipe.expire(meta_key, _SESSION_TTL_S)
+            if question_changed and session.get('question_json') is not None:
+                pipe.set(_session_key(session_id, "question"), _json_dumps(session['question_json']), ex=_QUESTION_TTL_S)
+            await pipe.execute()
+    except Exception:
+        # Best-effort persistence only; keep undelivered outbox messages locally
+        if outbox_messages:
+            session['outbox'].extend(outbox_messages)
+            session['outbox_seq'] += len(outbox_messages)
+    if outbox_messages:
+        session['outbox_event'].set()
+
+
+async def _outbox_seq(session_id: str, session) -> int:
+    """How many messages have ever been added to the session's outbox (local plus shared)."""
+    seq = session['outbox_seq']
+    if _redis_client is not None:
+        try:
+            seq += int(await _redis_client.get(_session_key(session_id, "outbox_seq")) or 0)
+        except Exception:
+            pass
+    return seq
+
+
+async def _drain_outbox(session_id: str, session) -> List[dict]:
+    """Pop every queued outbox message, from Redis when the shared store is enabled."""
+    outbox = list(session['outbox'])
+    session['outbox'].clear()
+    if _redis_client is None:
+        return outbox
+    try:
+        outbox_key = _session_key(session_id, "outbox")
+        # LRANGE + DEL in one MULTI/EXEC so concurrent producers never lose a message
+        async with _redis_client.pipeline(transaction=True) as pipe:
+            pipe.lrange(outbox_key, 0, -1)
+            pipe.delete(outbox_key)
+            raw_outbox, _ = await pipe.execute()
+        outbox.extend(_json_loads(m) for m in raw_outbox)
+    except Exception:
+        pass
+    return outbox
+
+
+def _recent_messages(session, n: int) -> List[dict]:
+    messages = session['messages']
+    return list(itertools.islice(messages, max(0, len(messages) - n), None))
+
+
 def _append_assistant_message(session, text: str):
     msg = {
         'role': 'assistant',
         'content': text,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': _utc_now_iso()
     }
     session['messages'].append(msg)
-    session['outbox'].append(msg)
+    if _redis_client is None:
+        session['outbox'].append(msg)
+        session['outbox_seq'] += 1
+        session['outbox_event'].set()
+    # With Redis the outbox entry is pushed (and the stream woken) by _save_session
+    return msg
+
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "32"))
+_dropped_events = 0
+# A flood of dropped events logs one summary line per interval, not one line per event
+_DROP_LOG_INTERVAL_S = 10.0
+_drop_logged_at = float("-inf")
 
 
-def _enqueue_event(session, event: dict):
+def _evict_lowest_priority(queue: list, priority: int) -> bool:
+    """Drop the oldest lowest-priority queued event if it ranks below `priority`."""
+    victim = max(queue, key=lambda item: (item[0], -item[1]))
+    if -victim[0] >= priority:
+        return False
+    queue.remove(victim)
+    heapq.heapify(queue)
+    return True
+
+
+def _enqueue_event(session, event: dict) -> bool:
+    """Queue an event for the session worker; False if it was dropped because the queue is full."""
+    global _dropped_events, _drop_logged_at
     etype = event.get('type') or 'SLM'
     priority = PRIORITY.get(etype, 0)
+    queue: list = session['queue']
+    if len(queue) >= MAX_QUEUE_DEPTH:
+        # Release valve: make room by shedding the least important backlog, or shed this event
+        _dropped_events += 1
+        evicted = _evict_lowest_priority(queue, priority)
+        now = time.monotonic()
+        if now - _drop_logged_at >= _DROP_LOG_INTERVAL_S:
+            _drop_logged_at = now
+            logger.warning("Event queue full for session %s: dropped %s event (%d dropped total)",
+                           session.get('session_id'),
+                           'a lower-priority queued' if evicted else 'incoming ' + etype, _dropped_events)
+        if not evicted:
+            return False
     # normalize event shape
-    session['queue'].append({
+    heapq.heappush(queue, (-priority, next(session['_seq']), {
         'priority': priority,
         'type': etype,
         'userMessage': event.get('userMessage'),
         'code': event.get('code'),
         'runOutput': event.get('output'),
         'runError': event.get('error'),
-        'timestamp': datetime.utcnow().isoformat(),
-    })
-
-
-def _dequeue_highest_priority(session):
-    if not session['queue']:
-        return None
-    session['queue'].sort(key=lambda e: e['priority'], reverse=True)
-    return session['queue'].pop(0)
+        'timestamp': _utc_now_iso(),
+    }))
+    session['queue_ready'].set()
+    return True
 
 
-def _build_prompt_from_context(session, user_message: Optional[str], current_code: Optional[str]) -> str:
-    history = session['messages'][-10:]
+async def _build_prompt_from_context(session, user_message: Optional[str], current_code: Optional[str]) -> str:
+    history = _recent_messages(session, 10)
     conversation_history = "\n".join([
         f"{'User' if m['role']=='user' else 'Assistant'}: {m['content']}" for m in history
     ])
@@ -120,32 +383,23 @@ def _build_prompt_from_context(session, user_message: Optional[str], current_cod
         f"SESSION MEMORY:\n- help_level: {help_level}\n- struggle_score: {struggle_score}",
         "",
     ]
-    if session.get('question_json'):
-        parts.append("QUESTION JSON:")
-        try:
-            parts.append(json.dumps(session['question_json'], ensure_ascii=False, indent=2))
-        except Exception:
-            parts.append(str(session['question_json']))
-        parts.append("")
+    question_block = _question_block(session)
+    if question_block:
+        parts.append(question_block)
     if conversation_history:
         parts.append(f"Previous conversation:\n{conversation_history}\n")
     if current_code:
         parts.append("CURRENT CODE:")
         parts.append(current_code)
         parts.append("")
-    # Enrich with recent runs and line history if possible
-    try:
-        recent_runs_section = _fetch_recent_runs_from_mongo(session.get('session_id'), limit=3)
-        if recent_runs_section:
-            parts.extend([""] + recent_runs_section + [""])
-    except Exception:
-        pass
-    try:
-        line_history_section = _fetch_line_history_compact(session.get('session_id'), max_lines=50)
-        if line_history_section:
-            parts.extend([""] + line_history_section + [""])
-    except Exception:
-        pass
+    # Enrich with recent runs and line history if possible (one session fetch for both)
+    doc = await _fetch_session_doc(session.get('session_id'))
+    recent_runs_section = _recent_runs_from_doc(doc, limit=3)
+    if recent_runs_section:
+        parts.extend([""] + recent_runs_section + [""])
+    line_history_section = _line_history_from_doc(doc, max_lines=50)
+    if line_history_section:
+        parts.extend([""] + line_history_section + [""])
     if user_message:
         parts.append(f"Current user message: {user_message}\n\nRespond now following the required format and rules above:")
     else:
@@ -153,47 +407,127 @@ def _build_prompt_from_context(session, user_message: Optional[str], current_cod
     return "\n".join(parts)
 
 
-def _process_queue(session_id: str):
-    session = _get_session(session_id)
-    if session['processing']:
-        return
-    session['processing'] = True
-    try:
-        while True:
-            event = _dequeue_highest_priority(session)
-            if not event:
-                break
-            user_message = event.get('userMessage')
-            current_code = event.get('code') or _read_last_slm_current_code() or None
-            prompt = _build_prompt_from_context(session, user_message=user_message, current_code=current_code)
-            try:
-                response_text_raw = llm.invoke(prompt)
-            except Exception as e:
-                response_text_raw = f"(internal error processing {event.get('type')}) {e}"
-            # Update memory from snapshot if available
-            try:
-                parsed_help, parsed_struggle = _extract_memory_from_snapshot_section(response_text_raw or "")
-                if parsed_help is not None:
-                    session['help_level'] = max(0, min(3, int(parsed_help)))
-                if parsed_struggle is not None:
-                    session['struggle_score'] = max(0, min(100, int(parsed_struggle)))
-            except Exception:
-                pass
-            # Append to messages and outbox
-            _append_assistant_message(session, response_text_raw)
-    finally:
-        session['processing'] = False
+_WORKER_IDLE_S = float(os.getenv("SESSION_WORKER_IDLE_S", "30"))
+# Event-queue LLM calls from all sessions share a bounded pool, so a burst of background
+# nudges can't exhaust Gemini quota or crowd out interactive /chat turns
+_LLM_WORKER_CONCURRENCY = int(os.getenv("LLM_WORKER_CONCURRENCY", "32"))
+_llm_worker_slots = asyncio.Semaphore(_LLM_WORKER_CONCURRENCY)
+# Background events (CODE_RUN/SLM) arriving within this window of each other share one LLM
+# call; the wait is capped so a steady stream still gets answered. USER_SPEECH is not delayed,
+# and one arriving mid-window is answered before the pending burst.
+_EVENT_DEBOUNCE_S = float(os.getenv("EVENT_DEBOUNCE_S", "0.5"))
+_EVENT_DEBOUNCE_MAX_S = float(os.getenv("EVENT_DEBOUNCE_MAX_S", "2.0"))
 
 
-def _run_async(coro):
-    try:
-        return asyncio.run(coro)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
+def _ensure_session_worker(session_id: str, session) -> None:
+    worker = session.get('worker')
+    if worker is None or worker.done():
+        session['worker'] = asyncio.create_task(_session_worker(session_id, session))
+
+
+def _user_speech_queued(queue: list) -> bool:
+    # The heap head is the most urgent queued event
+    return bool(queue) and -queue[0][0] >= PRIORITY['USER_SPEECH']
+
+
+async def _collect_burst(session, first) -> list:
+    """Wait out the debounce window after `first`, then take every background event queued meanwhile.
+
+    Events stay in the queue during the window, so MAX_QUEUE_DEPTH and eviction still apply.
+    A queued USER_SPEECH ends the window at once: `first` goes back in the queue and [] is
+    returned, so the worker answers the user before the burst.
+    """
+    queue: list = session['queue']
+    queue_ready: asyncio.Event = session['queue_ready']
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _EVENT_DEBOUNCE_MAX_S
+    while not _user_speech_queued(queue):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        queue_ready.clear()
         try:
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
+            await asyncio.wait_for(queue_ready.wait(), timeout=min(_EVENT_DEBOUNCE_S, remaining))
+        except asyncio.TimeoutError:
+            # Quiet for a whole debounce interval (or out of time): the burst is over
+            break
+    if _user_speech_queued(queue):
+        heapq.heappush(queue, first)
+        return []
+    batch = [first]
+    while queue:
+        batch.append(heapq.heappop(queue))
+    return batch
+
+
+def _merge_events(batch: list) -> dict:
+    """Fold a burst into one event: the most urgent type, every user message, the latest code/run."""
+    if len(batch) == 1:
+        return batch[0][2]
+    merged = dict(min(batch)[2])
+    in_order = [item[2] for item in sorted(batch, key=lambda item: item[1])]
+    user_messages = [e['userMessage'] for e in in_order if e.get('userMessage')]
+    merged['userMessage'] = "\n".join(user_messages) if user_messages else None
+    for field in ('code', 'runOutput', 'runError', 'timestamp'):
+        latest = [e[field] for e in in_order if e.get(field) is not None]
+        merged[field] = latest[-1] if latest else None
+    return merged
+
+
+async def _session_worker(session_id: str, session) -> None:
+    """Drain a session's event queue, one LLM turn per event burst; exits after sitting idle."""
+    queue: list = session['queue']
+    queue_ready: asyncio.Event = session['queue_ready']
+    while True:
+        if not queue:
+            queue_ready.clear()
+            try:
+                await asyncio.wait_for(queue_ready.wait(), timeout=_WORKER_IDLE_S)
+            except asyncio.TimeoutError:
+                if not queue:
+                    return
+            continue
+        first = heapq.heappop(queue)
+        event = first[2]
+        try:
+            if _EVENT_DEBOUNCE_S > 0 and event['priority'] < PRIORITY['USER_SPEECH']:
+                batch = await _collect_burst(session, first)
+                if not batch:
+                    continue
+                event = _merge_events(batch)
+            await _handle_event(session_id, session, event)
+        except Exception as e:
+            print(f"Error processing {event.get('type')} event: {str(e)}")
+
+
+async def _handle_event(session_id: str, session, event: dict) -> None:
+    user_message = event.get('userMessage')
+    current_code = event.get('code') or await asyncio.to_thread(_read_last_slm_current_code) or None
+    prompt = await _build_prompt_from_context(session, user_message=user_message, current_code=current_code)
+    try:
+        async with _llm_worker_slots:
+            response_text_raw = await llm.ainvoke(prompt)
+    except Exception as e:
+        response_text_raw = f"(internal error processing {event.get('type')}) {e}"
+    # Update memory from snapshot if available
+    try:
+        parsed_help, parsed_struggle = _extract_memory_from_snapshot_section(response_text_raw or "")
+        if parsed_help is not None:
+            session['help_level'] = max(0, min(3, int(parsed_help)))
+        if parsed_struggle is not None:
+            session['struggle_score'] = max(0, min(100, int(parsed_struggle)))
+    except Exception:
+        pass
+    # Append to messages and outbox
+    assistant_msg = _append_assistant_message(session, response_text_raw)
+    await _save_session(session_id, session, [assistant_msg], outbox_messages=[assistant_msg])
+
+
+async def _stop_session_workers() -> None:
+    workers = [s['worker'] for s in app.chat_sessions.values() if s.get('worker')]
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
 
 
 def _get_llm_log_path() -> Path:
@@ -205,16 +539,62 @@ def _get_llm_log_path() -> Path:
     return Path("/home/saksh/coding/hack/ai_backend/tmp/llm_responses.log")
 
 
+# -------------------- SLM dev log reads --------------------
+_SLM_SEP = "-" * 80
+# Initial window read back from EOF; grown only when the newest blocks don't have what we need
+_SLM_TAIL_BYTES = 256 * 1024
+# reader name -> ((stat key, args), result); the log changes far less often than it is read
+_SLM_RESULT_CACHE: dict = {}
+
+
+def _slm_log_key(log_path: Path) -> Optional[tuple]:
+    try:
+        st = log_path.stat()
+    except OSError:
+        return None
+    return (str(log_path), st.st_mtime_ns, st.st_size)
+
+
+def _iter_slm_blocks_newest_first(log_path: Path, size: int):
+    """Yield the raw separator-split blocks of the SLM log, newest first.
+
+    Reads a tail window from EOF and only widens it (x4) if the caller keeps
+    iterating past the blocks it contains, so the common case never reads the
+    whole file.
+    """
+    window = _SLM_TAIL_BYTES
+    emitted = 0
+    with log_path.open("rb") as f:
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            blocks = f.read(size - start).decode("utf-8", errors="ignore").split(_SLM_SEP)
+            if start > 0:
+                # The first piece may start mid-block
+                blocks = blocks[1:]
+            for i in range(len(blocks) - 1 - emitted, -1, -1):
+                emitted += 1
+                yield blocks[i]
+            if start == 0:
+                return
+            window *= 4
+
+
 def _read_last_slm_outputs(limit: int = 5, max_chars_per_output: int = 2000) -> List[str]:
     try:
         log_path = _get_llm_log_path()
-        if not log_path.exists():
+        key = _slm_log_key(log_path)
+        if key is None:
             return []
-        text = log_path.read_text(encoding="utf-8", errors="ignore")
-        sep = "-" * 80
-        blocks = [b.strip() for b in text.split(sep) if b.strip()]
+        memo_key = (key, limit, max_chars_per_output)
+        cached = _SLM_RESULT_CACHE.get('outputs')
+        if cached and cached[0] == memo_key:
+            return list(cached[1])
         results: List[str] = []
-        for blk in reversed(blocks):
+        for blk in _iter_slm_blocks_newest_first(log_path, key[2]):
+            blk = blk.strip()
+            if not blk:
+                continue
             header_end = blk.find("\n")
             header_line = blk[:header_end] if header_end != -1 else blk
             marker = "\nRESPONSE:\n"
@@ -228,7 +608,9 @@ def _read_last_slm_outputs(limit: int = 5, max_chars_per_output: int = 2000) ->
             results.append(pretty)
             if len(results) >= limit:
                 break
-        return list(reversed(results))
+        results.reverse()
+        _SLM_RESULT_CACHE['outputs'] = (memo_key, results)
+        return list(results)
     except Exception:
         return []
 
@@ -241,42 +623,54 @@ def _read_last_slm_current_code(max_chars: int = 4000) -> Optional[str]:
     """
     try:
         log_path = _get_llm_log_path()
-        if not log_path.exists():
+        key = _slm_log_key(log_path)
+        if key is None:
             return None
-        text = log_path.read_text(encoding="utf-8", errors="ignore")
-        sep = "-" * 80
-        blocks = [b for b in text.split(sep) if b.strip()]
-        for blk in reversed(blocks):
-            # Find PROMPT section
-            p_marker = "\nPROMPT:\n"
-            r_marker = "\nRESPONSE:\n"
-            p_idx = blk.find(p_marker)
-            r_idx = blk.find(r_marker)
-            if p_idx == -1 or r_idx == -1 or r_idx <= p_idx:
-                continue
-            prompt_text = blk[p_idx + len(p_marker):r_idx]
-            # Within prompt, find CURRENT CODE
-            cc_marker = "CURRENT CODE:\n"
-            cc_idx = prompt_text.find(cc_marker)
-            if cc_idx == -1:
-                continue
-            after = prompt_text[cc_idx + len(cc_marker):]
-            # Stop at METRICS or a heading-like section, or end
-            stop_markers = ["\nMETRICS:\n", "\nRECENT RUNS", "\nLINE HISTORY:", "\nQUESTION:", "\nLATEST METRICS:"]
-            stop_pos = len(after)
-            for sm in stop_markers:
-                si = after.find(sm)
-                if si != -1:
-                    stop_pos = min(stop_pos, si)
-            code_block = after[:stop_pos].strip()
-            if code_block:
-                if len(code_block) > max_chars:
-                    code_block = code_block[:max_chars] + "…"
-                return code_block
-        return None
+        memo_key = (key, max_chars)
+        cached = _SLM_RESULT_CACHE.get('current_code')
+        if cached and cached[0] == memo_key:
+            return cached[1]
+        result = _parse_last_slm_current_code(_iter_slm_blocks_newest_first(log_path, key[2]), max_chars)
+        _SLM_RESULT_CACHE['current_code'] = (memo_key, result)
+        return result
     except Exception:
         return None
 
+
+def _parse_last_slm_current_code(blocks, max_chars: int) -> Optional[str]:
+    for blk in blocks:
+        if not blk.strip():
+            continue
+        # Find PROMPT section
+        p_marker = "\nPROMPT:\n"
+        r_marker = "\nRESPONSE:\n"
+        p_idx = blk.find(p_marker)
+        r_idx = blk.find(r_marker)
+        if p_idx == -1 or r_idx == -1 or r_idx <= p_idx:
+            continue
+        prompt_text = blk[p_idx + len(p_marker):r_idx]
+        # Within prompt, find CURRENT CODE
+        cc_marker = "CURRENT CODE:\n"
+        cc_idx = prompt_text.find(cc_marker)
+        if cc_idx == -1:
+            continue
+        after = prompt_text[cc_idx + len(cc_marker):]
+        # Stop at METRICS or a heading-like section, or end
+        stop_markers = ["\nMETRICS:\n", "\nRECENT RUNS", "\nLINE HISTORY:", "\nQUESTION:", "\nLATEST METRICS:"]
+        stop_pos = len(after)
+        for sm in stop_markers:
+            si = after.find(sm)
+            if si != -1:
+                stop_pos = min(stop_pos, si)
+        code_block = after[:stop_pos].strip()
+        if code_block:
+            if len(code_block) > max_chars:
+                code_block = code_block[:max_chars] + "…"
+            return code_block
+    return None
+
+
+@lru_cache(maxsize=1)
 def _get_gemini_log_path() -> Path:
     try:
         base_dir = Path(__file__).resolve().parent
@@ -287,55 +681,119 @@ def _get_gemini_log_path() -> Path:
         return Path("/home/saksh/coding/hack/tmp/gemini_chat.log")
 
 
+@lru_cache(maxsize=1)
+def _get_gemini_io_log_path() -> Path:
+    try:
+        base_dir = Path(__file__).resolve().parent
+        return base_dir / "gemini_chat_io.log"
+    except Exception:
+        return Path("/home/saksh/coding/hack/gemini_chat_io.log")
+
+
+# -------------------- Buffered chat logs --------------------
+# Request handlers only format and enqueue records; one writer task appends them in batches.
+_LOG_BATCH_MAX = 100
+_LOG_BATCH_WAIT_S = 0.05
+_LOG_Q: Optional[asyncio.Queue] = None
+_LOG_TASK: Optional[asyncio.Task] = None
+
+
+def _write_log_batch(batch: List[Tuple[Path, bytes]]) -> None:
+    # One open + write per file for the whole batch
+    by_path: dict = {}
+    for path, payload in batch:
+        by_path.setdefault(path, []).append(payload)
+    for path, payloads in by_path.items():
+        try:
+            with path.open("ab") as f:
+                f.write(b"".join(payloads))
+        except Exception:
+            # Best-effort logging only
+            pass
+
+
+async def _log_writer(queue: asyncio.Queue) -> None:
+    # A None record is the shutdown sentinel; everything queued before it is written
+    stopping = False
+    while not stopping:
+        batch = [await queue.get()]
+        while len(batch) < _LOG_BATCH_MAX and batch[-1] is not None:
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=_LOG_BATCH_WAIT_S))
+            except asyncio.TimeoutError:
+                break
+        if batch[-1] is None:
+            stopping = True
+            batch.pop()
+        if batch:
+            await asyncio.to_thread(_write_log_batch, batch)
+
+
+def _start_log_writer() -> None:
+    global _LOG_Q, _LOG_TASK
+    if _LOG_TASK is not None and not _LOG_TASK.done():
+        return
+    _LOG_Q = asyncio.Queue()
+    _LOG_TASK = asyncio.create_task(_log_writer(_LOG_Q))
+
+
+async def _stop_log_writer() -> None:
+    global _LOG_Q, _LOG_TASK
+    if _LOG_TASK is None:
+        return
+    if not _LOG_TASK.done():
+        _LOG_Q.put_nowait(None)
+        await _LOG_TASK
+    _LOG_Q = None
+    _LOG_TASK = None
+
+
+def _enqueue_log(path: Path, payload: bytes) -> None:
+    if _LOG_TASK is None or _LOG_TASK.done():
+        _start_log_writer()
+    _LOG_Q.put_nowait((path, payload))
+
+
 def _append_gemini_prompt_response(prompt: str, response: str, session_id: Optional[str], extracted_json: Optional[str] = None) -> None:
     try:
         timestamp = datetime.utcnow().isoformat()
         sid = session_id or "-"
         separator = "=" * 80
-        log_path = _get_gemini_log_path()
-        with log_path.open("a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] session={sid}\n")
-            f.write("PROMPT:\n")
-            f.write(f"{prompt}\n\n")
-            f.write("RESPONSE:\n")
-            f.write(f"{response}\n")
-            f.write("\nEXTRACTED_JSON:\n")
-            if extracted_json and extracted_json.strip():
-                f.write(f"{extracted_json}\n")
-            else:
-                f.write("(none)\n")
-            f.write(f"{separator}\n")
+        extracted = f"{extracted_json}\n" if extracted_json and extracted_json.strip() else "(none)\n"
+        record = (
+            f"[{timestamp}] session={sid}\n"
+            f"PROMPT:\n{prompt}\n\n"
+            f"RESPONSE:\n{response}\n"
+            f"\nEXTRACTED_JSON:\n{extracted}"
+            f"{separator}\n"
+        )
+        _enqueue_log(_get_gemini_log_path(), record.encode("utf-8"))
     except Exception:
         # Best-effort logging only
         pass
 
 
-def _get_gemini_io_log_path() -> Path:
-    try:
-        base_dir = Path(__file__).resolve().parent
-        return base_dir / "gemini_chat_io.log"
-    except Exception:
-        return Path("/home/saksh/coding/hack/gemini_chat_io.log")
-
-
 def _append_gemini_io_log(prompt: str, response: str, session_id: Optional[str]) -> None:
     try:
         timestamp = datetime.utcnow().isoformat()
         sid = session_id or "-"
         sep = "-" * 80
-        log_path = _get_gemini_io_log_path()
-        with log_path.open("a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] session={sid}\n")
-            f.write("PROMPT:\n")
-            f.write(prompt)
-            f.write("\n\nOUTPUT:\n")
-            f.write(response)
-            f.write("\n")
-            f.write(sep)
-            f.write("\n")
+        record = f"[{timestamp}] session={sid}\nPROMPT:\n{prompt}\n\nOUTPUT:\n{response}\n{sep}\n"
+        _enqueue_log(_get_gemini_io_log_path(), record.encode("utf-8"))
     except Exception:
         pass
 
+
+@app.before_serving
+async def _startup() -> None:
+    _start_log_writer()
+
+
+@app.after_serving
+async def _shutdown() -> None:
+    await _stop_session_workers()
+    await _stop_log_writer()
+
 def _map_help_label_to_level(label: str) -> int:
     try:
         norm = (label or "").strip().lower()
@@ -354,6 +812,13 @@ def _map_help_label_to_level(label: str) -> int:
     return 0
 
 
+# Snapshot lines look like "* **Help tier:** Guide" / "* **Struggle score:** 42"; capture the
+# text after the first ':' on any line mentioning the label
+_HELP_TIER_RE = re.compile(r"^(?=[^\n]*help tier)[^\n:]*:([^\n]*)", re.IGNORECASE | re.MULTILINE)
+_STRUGGLE_RE = re.compile(r"^(?=[^\n]*struggle score)[^\n:]*:([^\n]*)", re.IGNORECASE | re.MULTILINE)
+_DIGIT_RE = re.compile(r"\d")
+
+
 def _extract_memory_from_snapshot_section(text: str) -> Tuple[Optional[int], Optional[int]]:
     """Parse the '### Interview Snapshot' section to get help_level and struggle_score.
 
@@ -371,31 +836,25 @@ def _extract_memory_from_snapshot_section(text: str) -> Tuple[Optional[int], Opt
         section = tail if end_idx == -1 else tail[:end_idx]
         help_level_val: Optional[int] = None
         struggle_val: Optional[int] = None
-        for line in section.splitlines():
-            l = line.strip()
-            if not l:
-                continue
-            if "help tier" in l.lower() and ":" in l:
-                try:
-                    label = l.split(":", 1)[1].strip()
-                    help_level_val = _map_help_label_to_level(label)
-                except Exception:
-                    pass
-            if "struggle score" in l.lower() and ":" in l:
-                try:
-                    right = l.split(":", 1)[1]
-                    digits = "".join(ch for ch in right if ch.isdigit())
-                    if digits:
-                        struggle_val = max(0, min(100, int(digits)))
-                except Exception:
-                    pass
+        # A later matching line overrides an earlier one
+        help_labels = _HELP_TIER_RE.findall(section)
+        if help_labels:
+            try:
+                help_level_val = _map_help_label_to_level(help_labels[-1].strip())
+            except Exception:
+                pass
+        for right in reversed(_STRUGGLE_RE.findall(section)):
+            digits = "".join(_DIGIT_RE.findall(right))
+            if digits:
+                struggle_val = max(0, min(100, int(digits)))
+                break
         return (help_level_val, struggle_val)
     except Exception:
         return (None, None)
 
 
-def _innov8_interviewer_system_prompt() -> str:
-    return ("""System Prompt for Conversational Coding Interviewer (JSON Output)
+# Static interviewer instructions, built once at import
+_SYSTEM_PROMPT = ("""System Prompt for Conversational Coding Interviewer (JSON Output)
 You are "Innov8," an expert and empathetic AI technical interviewer. Your primary goal is to guide a student through a Data Structures and Algorithms (DSA) coding interview, simulating a real, supportive, and insightful human interaction. You will be conducting this interview via an audio-based conversational interface.
 Your task is to analyze a comprehensive context package and generate a single, structured JSON response containing the exact text to be spoken aloud.
 1. Your Persona & Guiding Principles
@@ -457,93 +916,135 @@ JSON
 {
   "output_chat": "That's an interesting approach. What do you think the time complexity of your current solution is, and why? I have a small nudge ready if you need it. For your next steps, try to think about a data structure that allows for very fast lookups and how you might use it here. You're on the right track!"
 }
-""" )
+""")
 
 
-def _extract_output_chat(text: str) -> Optional[str]:
-    """Extract the output_chat string from a model response that should be JSON.
+def _innov8_interviewer_system_prompt() -> str:
+    return _SYSTEM_PROMPT
 
-    Tries direct parse, then searches for an embedded JSON object containing
-    an "output_chat" key. Returns None if not found/parsable.
-    """
-    try:
-        # Direct parse first
-        obj = json.loads(text)
-        if isinstance(obj, dict) and isinstance(obj.get("output_chat"), str):
-            return obj.get("output_chat")
-    except Exception:
-        pass
-    # Try to extract fenced or inline JSON containing output_chat
-    try:
-        # Common code-fence capture
-        m = re.search(r"```(?:json|JSON)?\s*(\{[\s\S]*?\})\s*```", text)
-        if m:
-            maybe = m.group(1)
-            obj = json.loads(maybe)
-            if isinstance(obj, dict) and isinstance(obj.get("output_chat"), str):
-                return obj.get("output_chat")
-    except Exception:
-        pass
-    try:
-        # Greedy object containing the key
-        m2 = re.search(r"(\{[\s\S]*?\"output_chat\"[\s\S]*?\})", text)
-        if m2:
-            maybe = m2.group(1)
-            obj = json.loads(maybe)
-            if isinstance(obj, dict) and isinstance(obj.get("output_chat"), str):
-                return obj.get("output_chat")
-    except Exception:
-        pass
+
+# Fenced ```json { ... }``` block in a model response
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(\{[\s\S]*?\})\s*```")
+_OUTPUT_CHAT_KEY = '"output_chat"'
+
+
+def _may_contain_output_json(text) -> bool:
+    # Every extraction strategy needs the literal key, so plain-prose replies skip the
+    # parse attempts (and their exceptions) entirely
+    return isinstance(text, str) and _OUTPUT_CHAT_KEY in text
+
+
+# Characters that matter when matching braces; everything else is skipped in C
+_BRACE_TOKEN_RE = re.compile(r'[{}"\\]')
+
+
+def _matching_brace(text: str, start: int) -> Optional[int]:
+    """Index of the '}' closing the '{' at start, ignoring braces inside JSON strings."""
+    depth = 0
+    in_string = False
+    escaped_at = -1
+    for m in _BRACE_TOKEN_RE.finditer(text, start):
+        pos = m.start()
+        ch = text[pos]
+        if in_string:
+            if pos == escaped_at:
+                continue
+            if ch == "\\":
+                escaped_at = pos + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return pos
+    return None
+
+
+def _object_containing_key(text: str, key: str = '"output_chat"') -> Optional[str]:
+    """Return the smallest brace-balanced {...} span that encloses the first occurrence of key."""
+    k = text.find(key)
+    if k == -1:
+        return None
+    start = text.rfind("{", 0, k)
+    while start != -1:
+        end = _matching_brace(text, start)
+        if end is not None and end > k:
+            return text[start:end + 1]
+        start = text.rfind("{", 0, start)
     return None
 
 
-def _extract_output_json_str(text: str) -> Optional[str]:
-    """Return a pretty JSON string containing the model's structured output.
+def _output_json_candidates(text: str):
+    """Yield each JSON object the reply might carry, parsing every candidate once.
 
-    Prefers a JSON object that includes the key "output_chat". Tries several
-    strategies similar to _extract_output_chat. If only the output_chat string
-    can be recovered, wraps it as {"output_chat": "..."}.
+    Order: the whole text, a fenced ```json block, then the brace-balanced object
+    around the "output_chat" key.
     """
     try:
-        obj = json.loads(text)
-        if isinstance(obj, dict) and "output_chat" in obj:
-            return json.dumps(obj, ensure_ascii=False, indent=2)
+        yield _json_loads(text)
     except Exception:
         pass
     try:
-        m = re.search(r"```(?:json|JSON)?\s*(\{[\s\S]*?\})\s*```", text)
+        m = _FENCE_RE.search(text) if '```' in text else None
         if m:
-            maybe = m.group(1)
-            obj = json.loads(maybe)
-            if isinstance(obj, dict) and "output_chat" in obj:
-                return json.dumps(obj, ensure_ascii=False, indent=2)
+            yield _json_loads(m.group(1))
     except Exception:
         pass
     try:
-        m2 = re.search(r"(\{[\s\S]*?\"output_chat\"[\s\S]*?\})", text)
-        if m2:
-            maybe = m2.group(1)
-            obj = json.loads(maybe)
-            if isinstance(obj, dict) and "output_chat" in obj:
-                return json.dumps(obj, ensure_ascii=False, indent=2)
+        maybe = _object_containing_key(text)
+        if maybe:
+            yield _json_loads(maybe)
     except Exception:
         pass
-    # Fallback: try to extract just the string and wrap it
+
+
+def _parse_llm_json(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return (output_chat, pretty_json) from a model response that should be JSON.
+
+    output_chat is the first "output_chat" string found; pretty_json is the first
+    object containing the key (indented), or {"output_chat": ...} wrapped around
+    the string when only that could be recovered. Either is None if not found.
+    """
+    if not _may_contain_output_json(text):
+        return (None, None)
+    output_chat: Optional[str] = None
+    found: Optional[dict] = None
+    for obj in _output_json_candidates(text):
+        if not isinstance(obj, dict) or "output_chat" not in obj:
+            continue
+        if found is None:
+            found = obj
+        if isinstance(obj.get("output_chat"), str):
+            output_chat = obj["output_chat"]
+            break
+    if found is None and output_chat is not None:
+        found = {"output_chat": output_chat}
+    pretty: Optional[str] = None
+    if found is not None:
+        try:
+            pretty = _json_dumps(found, pretty=True)
+        except Exception:
+            pass
+    return (output_chat, pretty)
+
+async def _fetch_session_doc(session_id: Optional[str]) -> Optional[dict]:
+    """Load the Node session document once per prompt; both Mongo sections render from it."""
+    if not session_id or not _find_session_by_id_async:
+        return None
     try:
-        oc = _extract_output_chat(text)
-        if isinstance(oc, str):
-            return json.dumps({"output_chat": oc}, ensure_ascii=False, indent=2)
+        return await _find_session_by_id_async(session_id)
     except Exception:
-        pass
-    return None
+        return None
 
-def _fetch_recent_runs_from_mongo(session_id: Optional[str], limit: int = 3, max_len: int = 2000) -> List[str]:
-    if not session_id or not _find_session_by_id_async:
+
+def _recent_runs_from_doc(doc: Optional[dict], limit: int = 3, max_len: int = 2000) -> List[str]:
+    if not doc:
         return []
     try:
-        doc = _run_async(_find_session_by_id_async(session_id))
-        if not doc:
-            return []
         subs = (doc.get("all_submissions") or [])
         tail = subs[-limit:]
         lines: List[str] = ["RECENT RUNS (last {}):".format(min(limit, len(tail)))]
@@ -561,13 +1062,26 @@ def _fetch_recent_runs_from_mongo(session_id: Optional[str], limit: int = 3, max
         return []
 
 
-def _fetch_line_history_compact(session_id: Optional[str], max_lines: int = 50) -> List[str]:
-    if not session_id or not _find_session_by_id_async:
+def _format_line_entry(e) -> str:
+    if not isinstance(e, dict):
+        return "[ts=None] ''"
+    content = e.get("content")
+    if isinstance(content, str):
+        content_display = content if len(content) <= 100 else content[:100] + "…"
+    else:
+        content_display = ""
+    metrics_obj = e.get("metrics")
+    if isinstance(metrics_obj, dict) and metrics_obj:
+        metrics_display = " {" + ", ".join([f"{mk}={mv}" for mk, mv in itertools.islice(metrics_obj.items(), 8)]) + "}"
+    else:
+        metrics_display = ""
+    return f"[ts={e.get('timestamp')}] '{content_display}'{metrics_display}"
+
+
+def _line_history_from_doc(doc: Optional[dict], max_lines: int = 50) -> List[str]:
+    if not doc:
         return []
     try:
-        doc = _run_async(_find_session_by_id_async(session_id))
-        if not doc:
-            return []
         lh = doc.get("lineHistory")
         if not lh:
             return []
@@ -577,25 +1091,8 @@ def _fetch_line_history_compact(session_id: Optional[str], max_lines: int = 50)
         items = lh.items() if isinstance(lh, dict) else (lh or [])
         for line, arr in items:
             try:
-                tail = (arr or [])[-3:]
-                pretty_entries: List[str] = []
-                for e in tail:
-                    ts = e.get("timestamp") if isinstance(e, dict) else None
-                    content = e.get("content") if isinstance(e, dict) else None
-                    metrics_obj = e.get("metrics") if isinstance(e, dict) else None
-                    if isinstance(content, str) and len(content) > 100:
-                        content_display = content[:100] + "…"
-                    else:
-                        content_display = content if isinstance(content, str) else ""
-                    if isinstance(metrics_obj, dict) and metrics_obj:
-                        items_str: List[str] = []
-                        for mk, mv in list(metrics_obj.items())[:8]:
-                            items_str.append(f"{mk}={mv}")
-                        metrics_display = " {" + ", ".join(items_str) + "}"
-                    else:
-                        metrics_display = ""
-                    pretty_entries.append(f"[ts={ts}] '{content_display}'{metrics_display}")
-                lines.append(f"- L{line}: " + " | ".join(pretty_entries))
+                entries = " | ".join([_format_line_entry(e) for e in (arr or [])[-3:]])
+                lines.append(f"- L{line}: {entries}")
                 count += 1
                 if count >= max_lines:
                     lines.append("(truncated)")
@@ -606,148 +1103,231 @@ def _fetch_line_history_compact(session_id: Optional[str], max_lines: int = 50)
     except Exception:
         return []
 
-@app.route('/chat', methods=['POST'])
-def chat():
+def _error_body(message: str) -> bytes:
+    return _json_dumps({'ok': False, 'error': message}).encode("utf-8")
+
+
+# Fixed error envelopes are encoded once; exception messages are serialized per response
+_SESSION_ID_REQUIRED_BODY = _error_body('sessionId is required')
+
+
+def _error_response(body: bytes, status: int = 500) -> Response:
+    """Wrap an encoded { ok: false, error } envelope used by the event endpoints."""
+    return Response(body, status=status, mimetype='application/json')
+
+
+def _chat_request_error(data) -> Optional[str]:
+    if not data or 'message' not in data:
+        return 'Message is required'
+    if not (data.get('message') or '').strip():
+        return 'Message cannot be empty'
+    return None
+
+
+async def _begin_chat_turn(data: dict) -> dict:
+    """Record the user's message and build the prompt for this chat turn."""
+    user_message = (data.get('message') or '').strip()
+
+    # Maintain per-session conversational context
+    session_id = data.get('sessionId') or secrets.token_urlsafe(16)
+    session = await _load_session(session_id)
+    session['session_id'] = session_id
+
+    # Append user message
+    user_msg = {
+        'role': 'user',
+        'content': user_message,
+        'timestamp': _utc_now_iso()
+    }
+    session['messages'].append(user_msg)
+
+    # Optional current code and question context
+    current_code = (data.get('code') or '').strip()
+    if not current_code:
+        # Fallback: try to read the last CURRENT CODE from SLM dev log
+        slm_code = await asyncio.to_thread(_read_last_slm_current_code)
+        if slm_code:
+            current_code = slm_code
+    incoming_question = data.get('questionJson')
+    question_changed = bool(incoming_question and incoming_question != session.get('question_json'))
+    if question_changed:
+        _set_question_json(session, incoming_question)
+
+    # Conversation-aware prompt (last 10 turns), same builder as the event worker
+    full_prompt = await _build_prompt_from_context(session, user_message=user_message, current_code=current_code)
+    return {
+        'session': session,
+        'session_id': session_id,
+        'user_msg': user_msg,
+        'question_changed': question_changed,
+        'prompt': full_prompt,
+    }
+
+
+async def _finish_chat_turn(turn: dict, response_text_raw: str) -> dict:
+    """Store the model's reply for a chat turn and return the /chat response payload."""
+    session = turn['session']
+    session_id = turn['session_id']
+    full_prompt = turn['prompt']
+
+    # Attempt to update memory state from the Interview Snapshot (use raw response)
     try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Message is required'}), 400
+        parsed_help, parsed_struggle = _extract_memory_from_snapshot_section(response_text_raw or "")
+        if parsed_help is not None:
+            session['help_level'] = max(0, min(3, int(parsed_help)))
+        if parsed_struggle is not None:
+            session['struggle_score'] = max(0, min(100, int(parsed_struggle)))
+    except Exception:
+        pass
 
-        user_message = (data.get('message') or '').strip()
-        if not user_message:
-            return jsonify({'error': 'Message cannot be empty'}), 400
+    # Append assistant response
+    assistant_msg = {
+        'role': 'assistant',
+        'content': response_text_raw,
+        'timestamp': _utc_now_iso()
+    }
+    session['messages'].append(assistant_msg)
+    await _save_session(session_id, session, [turn['user_msg'], assistant_msg], question_changed=turn['question_changed'])
 
-        # Maintain per-session conversational context
-        session_id = data.get('sessionId') or str(uuid.uuid4())
-        session = _get_session(session_id)
-        session['session_id'] = session_id
+    # Prefer JSON output if provided by the model; fall back to raw
+    output_chat, extracted_json_str = _parse_llm_json(response_text_raw)
+    tts_text = output_chat if isinstance(output_chat, str) and output_chat.strip() else response_text_raw
+
+    # Best-effort file logging of full prompt, raw output, and extracted JSON
+    try:
+        _append_gemini_prompt_response(full_prompt, response_text_raw, session_id, extracted_json_str)
+        _append_gemini_io_log(full_prompt, response_text_raw, session_id)
+    except Exception:
+        pass
+    return {
+        'response': tts_text,
+        'rawResponse': response_text_raw,
+        'sessionId': session_id,
+        'timestamp': _utc_now_iso()
+    }
 
-        # Append user message
-        session['messages'].append({
-            'role': 'user',
-            'content': user_message,
-            'timestamp': datetime.utcnow().isoformat()
-        })
-
-        # Optional current code and question context
-        current_code = (data.get('code') or '').strip()
-        if not current_code:
-            # Fallback: try to read the last CURRENT CODE from SLM dev log
-            slm_code = _read_last_slm_current_code()
-            if slm_code:
-                current_code = slm_code
-        incoming_question = data.get('questionJson')
-        if incoming_question and incoming_question != session.get('question_json'):
-            session['question_json'] = incoming_question
-
-        # Build conversation-aware prompt (last 10 turns)
-        history = session['messages'][-10:]
-        conversation_history = "\n".join([
-            f"{'User' if m['role']=='user' else 'Assistant'}: {m['content']}" for m in history
-        ])
-
-        system_context = _innov8_interviewer_system_prompt()
-        help_level = int(session.get('help_level') or 0)
-        struggle_score = int(session.get('struggle_score') or 0)
-
-        # Compose full prompt with question (once), current code, and expanded SLM/Mongo context
-        parts = [system_context, "", f"SESSION MEMORY:\n- help_level: {help_level}\n- struggle_score: {struggle_score}", ""]
-        if session.get('question_json'):
-            parts.append("QUESTION JSON:")
-            try:
-                import json as _json
-                parts.append(_json.dumps(session['question_json'], ensure_ascii=False, indent=2))
-            except Exception:
-                parts.append(str(session['question_json']))
-            parts.append("")
-        if conversation_history:
-            parts.append(f"Previous conversation:\n{conversation_history}\n")
-        if current_code:
-            parts.append("CURRENT CODE:")
-            parts.append(current_code)
-            parts.append("")
-        # Enrich with recent runs and line history from Mongo for this session
-        try:
-            recent_runs_section = _fetch_recent_runs_from_mongo(session_id, limit=3)
-            if recent_runs_section:
-                parts.extend([""] + recent_runs_section + [""])
-        except Exception:
-            pass
-        try:
-            line_history_section = _fetch_line_history_compact(session_id, max_lines=50)
-            if line_history_section:
-                parts.extend([""] + line_history_section + [""])
-        except Exception:
-            pass
-        # Note: Avoid injecting SLM RECENT OUTPUTS to prevent confusing example contexts
-        parts.append(f"Current user message: {user_message}\n\nRespond now following the required format and rules above:")
-        full_prompt = "\n".join(parts)
 
+@app.route('/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        error = _chat_request_error(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        turn = await _begin_chat_turn(data)
         # Generate response using Gemini
-        response_text_raw = llm.invoke(full_prompt)
+        response_text_raw = await llm.ainvoke(turn['prompt'])
+        return jsonify(await _finish_chat_turn(turn, response_text_raw))
 
-        # Attempt to update memory state from the Interview Snapshot (use raw response)
-        try:
-            parsed_help, parsed_struggle = _extract_memory_from_snapshot_section(response_text_raw or "")
-            if parsed_help is not None:
-                session['help_level'] = max(0, min(3, int(parsed_help)))
-            if parsed_struggle is not None:
-                session['struggle_score'] = max(0, min(100, int(parsed_struggle)))
-        except Exception:
-            pass
+    except Exception as e:
+        print(f"Error in chat endpoint: {str(e)}")
+        return jsonify({
+            'error': 'Failed to process chat message',
+            'details': str(e)
+        }), 500
 
-        # Append assistant response
-        session['messages'].append({
-            'role': 'assistant',
-            'content': response_text_raw,
-            'timestamp': datetime.utcnow().isoformat()
-        })
-        app.chat_sessions[session_id] = session
 
-        # Prefer JSON output if provided by the model; fall back to raw
-        output_chat = _extract_output_chat(response_text_raw)
-        tts_text = output_chat if isinstance(output_chat, str) and output_chat.strip() else response_text_raw
+_OUTPUT_CHAT_OPEN_RE = re.compile(r'"output_chat"\s*:\s*"')
+# One complete piece of a JSON string body: a run of plain characters or a whole escape
+_JSON_STR_PIECE_RE = re.compile(r'[^"\\]+|\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})')
 
-        # Best-effort file logging of full prompt, raw output, and extracted JSON
-        try:
-            extracted_json_str = _extract_output_json_str(response_text_raw)
-            _append_gemini_prompt_response(full_prompt, response_text_raw, session_id, extracted_json_str)
-            _append_gemini_io_log(full_prompt, response_text_raw, session_id)
-        except Exception:
-            pass
-        return jsonify({
-            'response': tts_text,
-            'rawResponse': response_text_raw,
-            'sessionId': session_id,
-            'timestamp': datetime.utcnow().isoformat()
-        })
 
+def _partial_output_chat(text: str) -> str:
+    """Decoded output_chat text of a reply that may still be streaming ('' until the key shows up).
+
+    Stops before an unfinished escape sequence, so successive calls on a growing
+    reply only ever extend the result.
+    """
+    m = _OUTPUT_CHAT_OPEN_RE.search(text)
+    if not m:
+        return ""
+    start = pos = m.end()
+    piece = _JSON_STR_PIECE_RE.match(text, pos)
+    while piece:
+        pos = piece.end()
+        piece = _JSON_STR_PIECE_RE.match(text, pos)
+    try:
+        decoded = json.loads(f'"{text[start:pos]}"')
+    except Exception:
+        return ""
+    # A high surrogate whose pair hasn't arrived yet would otherwise be emitted on its own
+    if decoded and "\ud800" <= decoded[-1] <= "\udbff":
+        decoded = decoded[:-1]
+    return decoded
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {_json_dumps(data)}\n\n"
+
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Same turn as /chat, streamed as Server-Sent Events.
+
+    Emits `data: {"delta": "...", "text": "..."}` per model chunk, where delta is
+    the raw model output and text (when present) is the newly decoded part of the
+    reply's output_chat, ready to display. A final `event: done` carries the
+    regular /chat response payload (or `event: error`).
+    """
+    try:
+        data = await request.get_json()
+        error = _chat_request_error(data)
+        if error:
+            return jsonify({'error': error}), 400
+        turn = await _begin_chat_turn(data)
     except Exception as e:
-        print(f"Error in chat endpoint: {str(e)}")
+        print(f"Error in chat stream endpoint: {str(e)}")
         return jsonify({
             'error': 'Failed to process chat message',
             'details': str(e)
         }), 500
 
+    async def events():
+        chunks: List[str] = []
+        spoken = ""
+        try:
+            async for chunk in llm.astream(turn['prompt']):
+                if chunk:
+                    chunks.append(chunk)
+                    update = {'delta': chunk}
+                    so_far = _partial_output_chat("".join(chunks))
+                    if len(so_far) > len(spoken):
+                        update['text'] = so_far[len(spoken):]
+                        spoken = so_far
+                    yield _sse(update)
+            payload = await _finish_chat_turn(turn, "".join(chunks))
+        except Exception as e:
+            print(f"Error in chat stream endpoint: {str(e)}")
+            yield _sse({'error': 'Failed to process chat message', 'details': str(e)}, event='error')
+            return
+        yield _sse(payload, event='done')
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 
 @app.route('/events/enqueue', methods=['POST'])
-def enqueue_event():
+async def enqueue_event():
     try:
-        data = request.get_json() or {}
-        session_id = data.get('sessionId') or str(uuid.uuid4())
-        session = _get_session(session_id)
+        data = await request.get_json() or {}
+        session_id = data.get('sessionId') or secrets.token_urlsafe(16)
+        session = await _load_session(session_id)
         session['session_id'] = session_id
         # Persist question if provided and changed
         if data.get('questionJson') and data['questionJson'] != session.get('question_json'):
-            session['question_json'] = data['questionJson']
-        _enqueue_event(session, data)
-        _process_queue(session_id)
+            _set_question_json(session, data['questionJson'])
+            await _save_session(session_id, session, [], question_changed=True)
+        accepted = _enqueue_event(session, data)
+        _ensure_session_worker(session_id, session)
+        if not accepted:
+            return jsonify({ 'ok': False, 'error': 'Event queue full', 'sessionId': session_id }), 429
         return jsonify({ 'ok': True, 'sessionId': session_id })
     except Exception as e:
-        return jsonify({ 'ok': False, 'error': str(e) }), 500
+        return _error_response(_error_body(str(e)), 500)
 
 @app.route('/chat/events/poll', methods=['GET'])
-def chat_events_poll():
+async def chat_events_poll():
     """Return any queued assistant messages (outbox) for a session and clear them.
 
     Frontend polls this endpoint to fetch nudges/comments produced by background
@@ -758,25 +1338,89 @@ def chat_events_poll():
       "count": 2,
       "messages": [ { role, content, timestamp }, ... ]
     }
+    The response carries an ETag; a poll sending it back in If-None-Match gets an
+    empty 304 until new messages arrive.
     """
     try:
         session_id = request.args.get('sessionId') or ''
         if not session_id:
-            return jsonify({ 'ok': False, 'error': 'sessionId is required' }), 400
+            return _error_response(_SESSION_ID_REQUIRED_BODY, 400)
         session = _get_session(session_id)
-        outbox = list(session.get('outbox') or [])
-        # Clear outbox once delivered
-        session['outbox'] = []
-        app.chat_sessions[session_id] = session
-        return jsonify({ 'ok': True, 'sessionId': session_id, 'count': len(outbox), 'messages': outbox })
+        # Read the sequence before draining so a message landing in between forces a refetch
+        etag = str(await _outbox_seq(session_id, session))
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            # Clear outbox once delivered
+            outbox = await _drain_outbox(session_id, session)
+            response = jsonify({ 'ok': True, 'sessionId': session_id, 'count': len(outbox), 'messages': outbox })
+        response.set_etag(etag)
+        # Never let a browser cache replay an already-delivered batch
+        response.headers['Cache-Control'] = 'no-store'
+        return response
     except Exception as e:
-        return jsonify({ 'ok': False, 'error': str(e) }), 500
+        return _error_response(_error_body(str(e)), 500)
+
+_SSE_KEEPALIVE_S = 15.0
+# With Redis, replies may be produced by another worker without waking this one's event
+_SSE_SHARED_CHECK_S = 1.0
+
+
+@app.route('/chat/events/stream', methods=['GET'])
+async def chat_events_stream():
+    """Push queued assistant messages (outbox) to the client as Server-Sent Events.
+
+    Each message is sent as `data: { role, content, timestamp }` as soon as it is
+    produced; a `: keepalive` comment goes out after 15 s of silence.
+    /chat/events/poll stays available for clients without EventSource.
+    """
+    session_id = request.args.get('sessionId') or ''
+    if not session_id:
+        return _error_response(_SESSION_ID_REQUIRED_BODY, 400)
+    wait_s = _SSE_KEEPALIVE_S if _redis_client is None else _SSE_SHARED_CHECK_S
+
+    async def events():
+        idle_s = 0.0
+        while True:
+            # Re-fetch each round: keeps an open stream's session from expiring (keepalives
+            # are far below the TTL) and follows it if it was evicted and recreated anyway
+            session = _get_session(session_id)
+            outbox_event = session['outbox_event']
+            outbox_event.clear()
+            outbox = await _drain_outbox(session_id, session)
+            for msg in outbox:
+                yield _sse(msg)
+            if outbox:
+                idle_s = 0.0
+            try:
+                await asyncio.wait_for(outbox_event.wait(), timeout=wait_s)
+            except asyncio.TimeoutError:
+                idle_s += wait_s
+                if idle_s >= _SSE_KEEPALIVE_S:
+                    idle_s = 0.0
+                    yield ": keepalive\n\n"
+
+    response = Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None  # long-lived stream: opt out of RESPONSE_TIMEOUT
+    return response
+
+
+_HEALTH_BODY = _json_dumps({'status': 'healthy', 'service': 'Gemini AI Chat Backend'}).encode("utf-8")
+
 
 @app.route('/health', methods=['GET'])
-def health():
-    return jsonify({'status': 'healthy', 'service': 'Gemini AI Chat Backend'})
+async def health():
+    # Constant body serialized once at import; load balancers hit this constantly
+    return Response(_HEALTH_BODY, mimetype='application/json')
 
 if __name__ == '__main__':
+    # Dev server only (single process). In production serve the ASGI app with one
+    # worker process per core, e.g.
+    #   hypercorn -w $(nproc) -k uvloop -b 0.0.0.0:5000 gemini_chat_backend:app
+    # Each worker's event loop multiplexes the in-flight Gemini calls, so gevent-style
+    # monkey-patching is neither needed nor compatible.
     print("Starting Gemini AI Chat Backend...")
     print(f"API Key configured: {'Yes' if api_key else 'No'}")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Reloader and debugger only on request: QUART_DEBUG=1 (FLASK_DEBUG=1 still honoured)
+    debug = (os.getenv('QUART_DEBUG') or os.getenv('FLASK_DEBUG')) == '1'
+    app.run(host='0.0.0.0', port=5000, debug=debug)
\ No newline at end of file
@@ -1,19 +1,61 @@
 from langchain_google_genai import GoogleGenerativeAI
+from functools import lru_cache
+from cachetools import TTLCache, cached
+import hashlib
 import os
+import threading
 
 api_key = os.getenv("GEMINI_API_KEY")
 
+MODEL = "gemini-flash-latest"
 
-def generate_response(prompt,temperature):
-    llm = GoogleGenerativeAI(
-        model="gemini-flash-latest", 
+# Optional shared response cache: identical (model, temperature, prompt) requests are
+# answered from Redis instead of calling Gemini again
+REDIS_URL = os.getenv("REDIS_URL")
+LLM_CACHE_TTL_S = int(os.getenv("LLM_CACHE_TTL_S", "86400"))
+
+try:
+    import redis
+    _redis_client = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+except Exception:
+    _redis_client = None
+
+
+def _cache_key(prompt, temperature):
+    return "llm:" + hashlib.sha256(f"{MODEL}|{temperature}|{prompt}".encode()).hexdigest()
+
+
+# One client per temperature, reused across calls (keeps its HTTP connection pool warm)
+@lru_cache(maxsize=8)
+def _get_llm(temperature):
+    return GoogleGenerativeAI(
+        model=MODEL, 
         google_api_key=api_key,
         temperature=temperature,  # Controls randomness (0.0 to 1.0)
     )
 
-    response = llm.invoke(
+
+# Process-local L1 in front of Redis, so hot prompts skip the round trip; entries
+# expire on the same TTL as the shared cache
+@cached(TTLCache(maxsize=256, ttl=LLM_CACHE_TTL_S), lock=threading.Lock())
+def generate_response(prompt,temperature):
+    key = _cache_key(prompt, temperature)
+    if _redis_client is not None:
+        try:
+            hit = _redis_client.get(key)
+            if hit is not None:
+                return hit.decode()
+        except Exception:
+            pass
+
+    response = _get_llm(temperature).invoke(
         prompt
     )
+    if _redis_client is not None:
+        try:
+            _redis_client.setex(key, LLM_CACHE_TTL_S, response)
+        except Exception:
+            pass
     return response
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import secrets
+import unittest
+from unittest import mock
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+# These tests exercise the in-process session store
+os.environ.pop("REDIS_URL", None)
+
+import gemini_chat_backend as backend  # noqa: E402
+
+
+def _new_session():
+    session_id = secrets.token_urlsafe(8)
+    session = backend._get_session(session_id)
+    session['session_id'] = session_id
+    return session_id, session
+
+
+def _queued(session):
+    """(type, userMessage) of each queued event, oldest first."""
+    return [(item[2]['type'], item[2]['userMessage']) for item in sorted(session['queue'], key=lambda item: item[1])]
+
+
+class EnqueueEventTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = backend.app.test_client()
+        patches = [
+            mock.patch.object(backend, "MAX_QUEUE_DEPTH", 2),
+            # Keep events in the queue so the cap is what's under test
+            mock.patch.object(backend, "_ensure_session_worker", lambda *a: None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def _enqueue(self, session_id, etype, message=None):
+        return await self.client.post("/events/enqueue", json={"sessionId": session_id, "type": etype, "userMessage": message})
+
+    async def test_full_queue_rejects_incoming_event_with_429(self):
+        session_id, session = _new_session()
+        for _ in range(2):
+            self.assertEqual((await self._enqueue(session_id, "SLM")).status_code, 200)
+        dropped = backend._dropped_events
+        response = await self._enqueue(session_id, "SLM")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(await response.get_json(), {'ok': False, 'error': 'Event queue full', 'sessionId': session_id})
+        self.assertEqual(backend._dropped_events, dropped + 1)
+        self.assertEqual([etype for etype, _ in _queued(session)], ["SLM", "SLM"])
+
+    async def test_higher_priority_event_evicts_oldest_lowest_priority(self):
+        session_id, session = _new_session()
+        await self._enqueue(session_id, "SLM", "first")
+        await self._enqueue(session_id, "SLM", "second")
+        self.assertEqual((await self._enqueue(session_id, "CODE_RUN", "run")).status_code, 200)
+        self.assertEqual(_queued(session), [("SLM", "second"), ("CODE_RUN", "run")])
+        self.assertEqual((await self._enqueue(session_id, "CODE_RUN", "run 2")).status_code, 200)
+        self.assertEqual(_queued(session), [("CODE_RUN", "run"), ("CODE_RUN", "run 2")])
+        # An equal-priority event can't make room
+        self.assertEqual((await self._enqueue(session_id, "CODE_RUN", "run 3")).status_code, 429)
+        self.assertEqual((await self._enqueue(session_id, "USER_SPEECH", "hi")).status_code, 200)
+        self.assertEqual(_queued(session), [("CODE_RUN", "run 2"), ("USER_SPEECH", "hi")])
+
+    async def test_drops_are_logged_at_most_once_per_interval(self):
+        session_id, _ = _new_session()
+        await self._enqueue(session_id, "SLM")
+        await self._enqueue(session_id, "SLM")
+        with mock.patch.object(backend, "_drop_logged_at", float("-inf")), \
+                self.assertLogs(backend.logger, "WARNING") as logs:
+            for _ in range(5):
+                await self._enqueue(session_id, "SLM")
+        self.assertEqual(len(logs.records), 1)
+
+
+
+class DebounceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.handled = []
+
+        async def handle_event(session_id, session, event):
+            self.handled.append((event['type'], event['userMessage']))
+
+        patches = [
+            mock.patch.object(backend, "_handle_event", handle_event),
+            mock.patch.object(backend, "_EVENT_DEBOUNCE_S", 0.2),
+            mock.patch.object(backend, "_EVENT_DEBOUNCE_MAX_S", 2.0),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.session_id, self.session = _new_session()
+        self.addCleanup(self._stop_worker)
+
+    def _stop_worker(self):
+        worker = self.session.get('worker')
+        if worker is not None:
+            worker.cancel()
+
+    def _enqueue(self, etype, message) -> bool:
+        accepted = backend._enqueue_event(self.session, {'type': etype, 'userMessage': message})
+        backend._ensure_session_worker(self.session_id, self.session)
+        return accepted
+
+    async def test_background_burst_is_merged_into_one_event(self):
+        self._enqueue("SLM", "nudge")
+        await asyncio.sleep(0.05)
+        self._enqueue("CODE_RUN", "ran")
+        await asyncio.sleep(0.05)
+        self._enqueue("SLM", "nudge 2")
+        await asyncio.sleep(0.4)
+        self.assertEqual(self.handled, [("CODE_RUN", "nudge\nran\nnudge 2")])
+
+    async def test_user_speech_ends_the_window_and_is_answered_first(self):
+        loop = asyncio.get_running_loop()
+        self._enqueue("CODE_RUN", "ran")
+        await asyncio.sleep(0.05)
+        self._enqueue("SLM", "nudge")
+        await asyncio.sleep(0.05)
+        spoke_at = loop.time()
+        self._enqueue("USER_SPEECH", "hi")
+        while not self.handled:
+            await asyncio.sleep(0.005)
+        self.assertLess(loop.time() - spoke_at, 0.1)
+        await asyncio.sleep(0.4)
+        self.assertEqual(self.handled, [("USER_SPEECH", "hi"), ("CODE_RUN", "ran\nnudge")])
+
+    async def test_events_waiting_in_the_window_count_toward_the_cap(self):
+        with mock.patch.object(backend, "MAX_QUEUE_DEPTH", 2):
+            self._enqueue("SLM", "a")
+            await asyncio.sleep(0.05)
+            self.assertTrue(self._enqueue("SLM", "b"))
+            await asyncio.sleep(0.05)
+            self.assertTrue(self._enqueue("SLM", "c"))
+            # Still inside the window (each arrival restarts it), past the first 0.2 s tick
+            await asyncio.sleep(0.15)
+            self.assertFalse(self._enqueue("SLM", "d"))
+            await asyncio.sleep(0.4)
+        self.assertEqual(self.handled, [("SLM", "a\nb\nc")])
+
+
+
+class PollTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = backend.app.test_client()
+        self.session_id, self.session = _new_session()
+
+    async def _poll(self, etag=None):
+        headers = {"If-None-Match": f'"{etag}"'} if etag is not None else {}
+        return await self.client.get("/chat/events/poll", query_string={"sessionId": self.session_id}, headers=headers)
+
+    async def test_matching_etag_gets_304_without_draining(self):
+        backend._append_assistant_message(self.session, "hello")
+        first = await self._poll()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([m['content'] for m in (await first.get_json())['messages']], ["hello"])
+        etag = first.headers['ETag'].strip('"')
+        self.assertEqual(first.headers['Cache-Control'], 'no-store')
+
+        with mock.patch.object(backend, "_drain_outbox", mock.AsyncMock(return_value=[])) as drain:
+            unchanged = await self._poll(etag)
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(await unchanged.get_data(), b"")
+        self.assertEqual(unchanged.headers['ETag'].strip('"'), etag)
+        drain.assert_not_called()
+
+    async def test_new_message_changes_the_etag(self):
+        etag = (await self._poll()).headers['ETag'].strip('"')
+        backend._append_assistant_message(self.session, "nudge")
+        response = await self._poll(etag)
+        self.assertEqual(response.status_code, 200)
+        body = await response.get_json()
+        self.assertEqual((body['count'], body['messages'][0]['content']), (1, "nudge"))
+        self.assertNotEqual(response.headers['ETag'].strip('"'), etag)
+        # Delivered messages are not handed out again
+        self.assertEqual((await (await self._poll()).get_json())['count'], 0)
+
+    async def test_session_id_is_required(self):
+        response = await self.client.get("/chat/events/poll")
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
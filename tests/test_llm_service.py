@@ -0,0 +1,108 @@
+import os
+import unittest
+from unittest import mock
+
+from diff_match_patch import diff_match_patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from ai_backend.app.services import llm_service  # noqa: E402
+
+
+def _pure_dmp():
+    dmp = diff_match_patch()
+    dmp.Diff_Timeout = 1.0
+    dmp.Match_Threshold = 0.5
+    return dmp
+
+
+_BASE = "\n".join(f"def f{i}(x):\n    return x * {i}" for i in range(200))
+
+# (code the patch was made against, code it is applied to, edited code)
+_CASES = [
+    ("", "", "print('hi')\n"),
+    ("a = 1\n", "a = 1\n", "a = 2\n"),
+    (_BASE, _BASE, _BASE.replace("return x * 7\n", "return x + 7\n").replace("def f150", "def g150")),
+    (_BASE, _BASE, _BASE[:5000] + "# inserted\n" + _BASE[5000:]),
+    # The base drifted since the patch was made, so patch_apply has to fuzzy-match
+    (_BASE, "# header\n" + _BASE.replace("def f3(", "def h3("), _BASE.replace("return x * 120", "return -x")),
+    # Above _INLINE_PATCH_CHARS, so _apply_patch runs it in a worker thread
+    (_BASE * 3, _BASE * 3, (_BASE * 3).replace("def f99(", "def renamed(")),
+    ("αβγ\n😀 emoji\n", "αβγ\n😀 emoji\n", "αβγδ\n😀 emoji 😀\n"),
+]
+
+
+@unittest.skipUnless(llm_service._fast_dmp is not None, "fast_diff_match_patch is not installed")
+class FastDiffMatchPatchTest(unittest.TestCase):
+    def test_patch_apply_matches_pure_python(self):
+        fast = llm_service._FastDiffMatchPatch()
+        fast.Diff_Timeout, fast.Match_Threshold = 1.0, 0.5
+        pure = _pure_dmp()
+        for made_from, applied_to, edited in _CASES:
+            patch_text = pure.patch_toText(pure.patch_make(made_from, edited))
+            with self.subTest(patch=patch_text[:40]):
+                self.assertEqual(
+                    fast.patch_apply(fast.patch_fromText(patch_text), applied_to),
+                    pure.patch_apply(pure.patch_fromText(patch_text), applied_to),
+                )
+
+
+class ApplyPatchTest(unittest.IsolatedAsyncioTestCase):
+    async def test_inline_and_threaded_paths_match_pure_python(self):
+        pure = _pure_dmp()
+        for made_from, applied_to, edited in _CASES:
+            patch_text = pure.patch_toText(pure.patch_make(made_from, edited))
+            with self.subTest(size=len(applied_to)):
+                expected = pure.patch_apply(pure.patch_fromText(patch_text), applied_to)[0]
+                self.assertEqual(await llm_service._apply_patch(applied_to, patch_text), expected)
+
+
+def _line_history(n_lines, content="x = 1"):
+    return {str(i): [{"timestamp": i, "content": content, "metrics": {"len": len(content)}}] for i in range(1, n_lines + 1)}
+
+
+def _runs(n_runs, output="ok"):
+    return [{"timestamp": i, "output": output, "error": ""} for i in range(n_runs)]
+
+
+def _sections(text):
+    """Split rendered context into (LINE HISTORY, RECENT RUNS) text."""
+    history, _, runs = text.partition("RECENT RUNS (last 3):")
+    return history.strip(), runs.strip()
+
+
+class RenderContextTest(unittest.TestCase):
+    def test_long_line_history_does_not_push_out_recent_runs(self):
+        node_session = {"lineHistory": _line_history(40, "y" * 100), "all_submissions": _runs(3, "done")}
+        with mock.patch.object(llm_service, "MAX_CTX_BYTES", 500):
+            text = llm_service._render_context(None, node_session)
+        history, runs = _sections(text)
+        self.assertTrue(history.endswith("(truncated)"))
+        self.assertEqual(runs.count("output:\ndone"), 3)
+        self.assertNotIn("(truncated)", runs)
+
+    def test_each_section_is_marked_when_it_overflows(self):
+        node_session = {"lineHistory": _line_history(40, "y" * 100), "all_submissions": _runs(3, "z" * 1000)}
+        with mock.patch.object(llm_service, "MAX_CTX_BYTES", 500):
+            text = llm_service._render_context(None, node_session)
+        history, runs = _sections(text)
+        self.assertTrue(history.endswith("(truncated)"))
+        self.assertTrue(runs.endswith("(truncated)"))
+        self.assertEqual(text.count("(truncated)"), 2)
+
+    def test_line_history_stops_at_50_lines(self):
+        text = llm_service._render_context(None, {"lineHistory": _line_history(80)})
+        self.assertIn("(truncated)", text)
+        self.assertIn("- L50:", text)
+        self.assertNotIn("- L51:", text)
+        self.assertNotIn("(truncated)", llm_service._render_context(None, {"lineHistory": _line_history(49)}))
+
+    def test_lines_without_entries_are_skipped_and_not_counted(self):
+        lh = {"0": ["not a dict"], **_line_history(50)}
+        text = llm_service._render_context(None, {"lineHistory": lh})
+        self.assertNotIn("- L0:", text)
+        self.assertIn("- L50:", text)
+
+
+if __name__ == "__main__":
+    unittest.main()